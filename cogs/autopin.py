@@ -11,29 +11,21 @@ class AutoPin(commands.Cog):
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload):
+    async def on_pin_reaction_add(self, ctx):
         """
         if the message has X or more 'pin' emojis pin the message
         """
-        channel = self.bot.get_channel(payload.channel_id)
-        if channel is None:
-            return
-        try:
-            message = await channel.fetch_message(payload.message_id)
-        except discord.errors.NotFound:
-            return
-        emoji = payload.emoji.name
-        if emoji == '📌':
-            for reaction in message.reactions:
-                if reaction.emoji == '📌' and \
-                   reaction.count >= Config.autopin_count and \
-                   not message.pinned and \
-                   message.channel.id not in Config.autopin_banned_channels:
-                    users = await reaction.users().flatten()
-                    await self.log(message, users)
-                    await message.pin()
-                    await message.clear_reaction('📌')
-                    break
+        message = ctx['message']
+        for reaction in message.reactions:
+            if reaction.emoji == '📌' and \
+               reaction.count >= Config.autopin_count and \
+               not message.pinned and \
+               message.channel.id not in Config.autopin_banned_channels:
+                users = await reaction.users().flatten()
+                await self.log(message, users)
+                await message.pin()
+                await message.clear_reaction('📌')
+                break
 
     async def log(self, message, users):
         """
@@ -320,63 +320,14 @@ class FitWide(commands.Cog):
     @commands.command()
     async def update_db(self, ctx, convert_0xit: bool = False):
         with open("merlin-latest", "r") as f:
-            data = f.readlines()
-
-        found_people = []
-        found_logins = []
-        new_logins = []
-        login_results = session.query(Valid_person.login).all()
-        # Use unpacking on results
-        old_logins = [value for value, in login_results]
-
-        for line in data:
-            line = line.split(":")
-            login = line[0]
-            name = line[4].split(",", 1)[0]
-            try:
-                year = line[4].split(",")[1]
-            except IndexError:
-                continue
-
-            if convert_0xit and year.endswith("1r"):
-                person = session.query(Valid_person).\
-                    filter(Valid_person.login == login).\
-                    one_or_none()
-                if person is not None and person.year.endswith("0r"):
-                    year = year.replace("1r", "0r")
-
-            found_people.append(Valid_person(login=login, year=year,
-                                             name=name))
-            found_logins.append(login)
-
-        for login in found_logins:
-            if login not in old_logins:
-                new_logins.append(login)
-
-        await ctx.send(f"Našel jsem {len(new_logins)} nových loginů.")
-
-        for person in found_people:
-            session.merge(person)
-
-        cnt_new = 0
-        for person in session.query(Valid_person):
-            if person.login not in found_logins:
-                try:
-                    # check for muni
-                    int(person.login)
-                    person.year = "MUNI"
-                except ValueError:
-                    person.year = "dropout"
-            elif convert_0xit and person.login in new_logins:
-                if person.year.endswith("1r"):
-                    person.year = person.year.replace("1r", "0r")
-                    cnt_new += 1
-
-        session.commit()
+            result = await user_r.aio.import_persons(f, convert_0xit)
 
+        await ctx.send(f"Našel jsem {result['new']} nových loginů.")
+        await ctx.send(f"Změněno {result['updated']} loginů, "
+                       f"{result['missing']} chybějících označeno jako MUNI/dropout.")
         await ctx.send("Aktualizace databáze proběhla úspěšně.")
         if convert_0xit:
-            await ctx.send(f"Debug: Našel jsem {cnt_new} nových prvaků.")
+            await ctx.send(f"Debug: Našel jsem {result['first_year']} nových prvaků.")
 
     @commands.cooldown(rate=2, per=20.0, type=commands.BucketType.user)
     @commands.check(is_in_modroom)
@@ -1,11 +1,11 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 import utils
-import re
 import datetime
 from config import app_config as config, messages
 from features import karma
+from features.action_queue import actions
 from repository import karma_repo
 from cogs import room_check
 
@@ -21,84 +21,80 @@ class Karma(commands.Cog):
         self.bot = bot
         self.karma = karma.Karma(bot, karma_r)
         self.check = room_check.RoomCheck(bot)
+        self.flush_karma.start()
+
+    def cog_unload(self):
+        self.flush_karma.cancel()
+        karma_r.flush_karma()
+
+    @tasks.loop(seconds=config.karma_flush_interval)
+    async def flush_karma(self):
+        await karma_r.aio.flush_karma()
+
+    @commands.Cog.listener()
+    async def on_karma_vote_reaction_add(self, ctx):
+        if ctx['emoji'] not in ["✅", "❌", "0⃣"]:
+            await ctx['message'].remove_reaction(ctx['emoji'], ctx['member'])
+        else:
+            users = []
+            for reaction in ctx['message'].reactions:
+                users.append(await reaction.users().flatten())
+            # Flatten the final list
+            users = [x for y in users for x in y]
+            if users.count(ctx['member']) > 1:
+                await ctx['message'].remove_reaction(ctx['emoji'], ctx['member'])
 
     @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload):
-        ctx = await utils.reaction_get_ctx(self.bot, payload)
-        if ctx is None:
+    async def on_leaderboard_reaction_add(self, ctx):
+        embed = ctx['message'].embeds[0]
+        column, attribute, max_page = await self.karma.get_db_from_title(embed.title)
+        if column is None:
             return
+
+        if not embed.description is discord.Embed.Empty:
+            current_page = int(embed.description.split(' – ')[0])
+        else:
+            current_page = max_page
+        if ctx['emoji'] == "▶":
+            next_page = current_page + 10
+            if next_page > max_page - 9:
+                next_page = max_page - 9
+        elif ctx['emoji'] == "◀":
+            next_page = current_page - 10
+            if next_page <= 0:
+                next_page = 1
+        elif ctx['emoji'] == "⏪":
+            next_page = 1
+        embed.description = await self.karma.gen_leaderboard_content(attribute, next_page, column)
+        embed.timestamp = datetime.datetime.now(tz=datetime.timezone.utc)
+        await actions.edit(ctx['message'], embed=embed)
+        if ctx['message'].guild:
+            await actions.remove_reaction(ctx['message'], ctx['emoji'], ctx['member'])
+
+    def is_karma_reaction(self, ctx):
+        return ctx['member'].id != ctx['message'].author.id and\
+            ctx['guild'].id == config.guild_id and\
+            ctx['message'].channel.id not in config.karma_banned_channels and\
+            config.karma_ban_role_id not in map(lambda x: x.id, ctx['member'].roles)
+
+    @commands.Cog.listener()
+    async def on_karma_reaction_add(self, ctx):
         # grillbot emoji for removing message causes errors
         if ctx['emoji'] == "⏹️":
             return
-        if ctx['message'].content.startswith(config.role_string) or\
-           ctx['channel'].id in config.role_channels:
-            return
-        # handle karma vote
-        elif ctx['message'].content.startswith(messages.karma_vote_message_hack):
-            if ctx['emoji'] not in ["✅", "❌", "0⃣"]:
-                await ctx['message'].remove_reaction(ctx['emoji'], ctx['member'])
-            else:
-                users = []
-                for reaction in ctx['message'].reactions:
-                    users.append(await reaction.users().flatten())
-                # Flatten the final list
-                users = [x for y in users for x in y]
-                if users.count(ctx['member']) > 1:
-                    await ctx['message'].remove_reaction(ctx['emoji'], ctx['member'])
-        # leaderboard pagination
-        elif ctx['message'].embeds and ctx['message'].embeds[0].title is not discord.Embed.Empty and\
-                re.match(r".* (LEADER|BAJKAR|ISHA|GIVING)BOARD .*", ctx['message'].embeds[0].title) and\
-                ctx['emoji'] in ["◀", "▶", "⏪"]:
-            embed = ctx['message'].embeds[0]
-            column, attribute, max_page = self.karma.get_db_from_title(embed.title)
-            if column is None:
-                return
-            
-            if not embed.description is discord.Embed.Empty:
-                current_page = int(embed.description.split(' – ')[0])
-            else:
-                current_page = max_page
-            if ctx['emoji'] == "▶":
-                next_page = current_page + 10
-                if next_page > max_page - 9:
-                    next_page = max_page - 9
-            elif ctx['emoji'] == "◀":
-                next_page = current_page - 10
-                if next_page <= 0:
-                    next_page = 1
-            elif ctx['emoji'] == "⏪":
-                next_page = 1
-            embed.description = self.karma.gen_leaderboard_content(attribute, next_page, column)
-            embed.timestamp = datetime.datetime.now(tz=datetime.timezone.utc)
-            await ctx['message'].edit(embed=embed)
-            if ctx['message'].guild:
-                await ctx['message'].remove_reaction(ctx['emoji'], ctx['member'])
-        # handle karma
-        elif ctx['member'].id != ctx['message'].author.id and\
-                ctx['guild'].id == config.guild_id and\
-                ctx['message'].channel.id not in \
-                config.karma_banned_channels and \
-                config.karma_ban_role_id not in map(lambda x: x.id, ctx['member'].roles):
+        if self.is_karma_reaction(ctx):
             if isinstance(ctx['emoji'], str):
-                karma_r.karma_emoji(ctx['message'].author, ctx['member'], ctx['emoji'])
+                await karma_r.aio.karma_emoji(ctx['message'].author, ctx['member'], ctx['emoji'])
             else:
-                karma_r.karma_emoji(ctx['message'].author, ctx['member'], ctx['emoji'].id)
+                await karma_r.aio.karma_emoji(ctx['message'].author, ctx['member'], ctx['emoji'].id)
 
     @commands.Cog.listener()
-    async def on_raw_reaction_remove(self, payload):
-        ctx = await utils.reaction_get_ctx(self.bot, payload)
-        if ctx is None:
-            return
-
-        if ctx['member'].id != ctx['message'].author.id and \
-                ctx['guild'].id == config.guild_id and \
-                ctx['message'].channel.id not in \
-                config.karma_banned_channels and \
-                config.karma_ban_role_id not in map(lambda x: x.id, ctx['member'].roles):
+    async def on_karma_reaction_remove(self, ctx):
+        if self.is_karma_reaction(ctx):
             if isinstance(ctx['emoji'], str):
-                karma_r.karma_emoji_remove(ctx['message'].author, ctx['member'], ctx['emoji'])
+                await karma_r.aio.karma_emoji_remove(ctx['message'].author, ctx['member'], ctx['emoji'])
             else:
-                karma_r.karma_emoji_remove(ctx['message'].author, ctx['member'], ctx['emoji'].id)
+                await karma_r.aio.karma_emoji_remove(ctx['message'].author, ctx['member'], ctx['emoji'].id)
 
     @commands.cooldown(rate=5, per=30.0, type=commands.BucketType.user)
     @commands.group(pass_context=True)
@@ -107,7 +103,7 @@ class Karma(commands.Cog):
             args = ctx.message.content.split()[1:]
 
             if len(args) == 0:
-                await ctx.send(self.karma.karma_get(ctx.author))
+                await ctx.send(await self.karma.karma_get(ctx.author))
                 await self.check.botroom_check(ctx.message)
             else:
                 await ctx.send(utils.fill_message("karma_invalid_command", user=ctx.author.id))
@@ -121,7 +117,7 @@ class Karma(commands.Cog):
             await ctx.send(utils.fill_message('member_not_found', user=ctx.author.id))
             return
 
-        await ctx.send(self.karma.karma_get(ctx.author, target_member))
+        await ctx.send(await self.karma.karma_get(ctx.author, target_member))
         await self.check.botroom_check(ctx.message)
 
     @karma.command()
@@ -0,0 +1,80 @@
+import re
+
+import discord
+from discord.ext import commands
+
+import utils
+from config import app_config as config, messages
+
+config = config.Config
+messages = messages.Messages
+
+leaderboard_regex = re.compile(r".* (LEADER|BAJKAR|ISHA|GIVING)BOARD .*")
+review_regex = re.compile(".* reviews")
+pagination_emojis = ["◀", "▶", "⏪"]
+
+
+class Reactions(commands.Cog):
+    """Resolves raw reactions once and dispatches them to interested cogs as
+    `on_<kind>_reaction_add(ctx)` events, kind is the result of `classify`.
+
+    Reactions that count as karma are dispatched as `on_karma_reaction_add/remove`,
+    pin emojis as `on_pin_reaction_add`.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def classify(self, message):
+        if message.content.startswith(config.role_string) or\
+           message.channel.id in config.role_channels:
+            return 'role'
+        if message.content.startswith(messages.karma_vote_message_hack):
+            return 'karma_vote'
+        if message.embeds and message.embeds[0].title is not discord.Embed.Empty:
+            title = message.embeds[0].title
+            if leaderboard_regex.match(title):
+                return 'leaderboard'
+            if review_regex.match(title):
+                return 'review'
+            if title == "Rubbergod":
+                return 'help'
+        if message.channel.id in config.deduplication_channels and message.author.bot:
+            return 'repost'
+        return 'plain'
+
+    def is_karma(self, kind, emoji):
+        if kind in ('role', 'karma_vote'):
+            return False
+        # pagination of leaderboard doesn't count, other emojis do
+        return kind != 'leaderboard' or emoji not in pagination_emojis
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        ctx = await utils.reaction_get_ctx(self.bot, payload)
+        if ctx is None:
+            return
+
+        kind = self.classify(ctx['message'])
+        if kind != 'plain' and (kind != 'leaderboard' or ctx['emoji'] in pagination_emojis):
+            self.bot.dispatch(f'{kind}_reaction_add', ctx)
+        if self.is_karma(kind, ctx['emoji']):
+            self.bot.dispatch('karma_reaction_add', ctx)
+        if ctx['emoji'] == '📌':
+            self.bot.dispatch('pin_reaction_add', ctx)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        ctx = await utils.reaction_get_ctx(self.bot, payload)
+        if ctx is None:
+            return
+
+        kind = self.classify(ctx['message'])
+        if kind == 'role':
+            self.bot.dispatch('role_reaction_remove', ctx)
+        if self.is_karma(kind, ctx['emoji']):
+            self.bot.dispatch('karma_reaction_remove', ctx)
+
+
+def setup(bot):
+    bot.add_cog(Reactions(bot))
@@ -1,11 +1,10 @@
-from bs4 import BeautifulSoup
 import discord
 import datetime
 from discord.ext import commands
-import re
-import requests
 
 from config import app_config as config, messages
+from features.action_queue import actions
+from features.subject_sync import subject_sync
 from repository import review_repo
 import utils
 
@@ -52,7 +51,7 @@ class Review(commands.Cog):
                 await ctx.send(messages.review_format)
                 return
             subject = args[0]
-            embed = self.rev.list_reviews(subject.lower())
+            embed = await self.rev.list_reviews(subject.lower())
             if not embed:
                 await ctx.send(messages.review_wrong_subject)
                 return
@@ -146,19 +145,18 @@ class Review(commands.Cog):
         for subject in subjects:
             subject = subject.lower()
             review_repo.get_subject(subject).delete()
+        # reviews of removed subjects are deleted by cascade
+        review_repo.invalidate_tierboard()
+        review_repo.invalidate_reviews_count()
         await ctx.send(f"Zkratky `{subjects}` byli odebrány.")
 
     @subject.command()
     async def update(self, ctx):
         """Updates subjects from web"""
         async with ctx.channel.typing():
-            if not self.rev.update_subject_types("https://www.fit.vut.cz/study/program/18/.cs", False):
+            if not await subject_sync.sync():
                 await ctx.send(messages.subject_update_error)
                 return
-            for id in range(31, 47):
-                if not self.rev.update_subject_types(f"https://www.fit.vut.cz/study/field/{id}/.cs", True):
-                    await ctx.send(messages.subject_update_error)
-                    return
             await ctx.send(messages.subject_update_success)
 
     @commands.command(aliases=["skratka", "zkratka", "wtf"])
@@ -172,10 +170,10 @@ class Review(commands.Cog):
             await ctx.send(messages.review_wrong_subject)
             return
         embed = discord.Embed(title=subject.shortcut, description=subject.name)
-        embed.add_field(name="Semestr", value=subject.semester)
-        embed.add_field(name="Typ", value=subject.type)
-        if subject.year:
-            embed.add_field(name="Ročník", value=subject.year)
+        embed.add_field(name="Semestr", value=", ".join(link.semester for link in subject.semesters))
+        embed.add_field(name="Typ", value=", ".join(link.type for link in subject.types))
+        if subject.years:
+            embed.add_field(name="Ročník", value=", ".join(link.year for link in subject.years))
         embed.add_field(name="Kredity", value=subject.credits)
         embed.add_field(name="Ukončení", value=subject.end)
         embed.add_field(name="Karta předmětu", value=subject.card, inline=False)
@@ -238,74 +236,70 @@ class Review(commands.Cog):
             await ctx.send(utils.fill_message("insufficient_rights", user=ctx.author.id))
 
     @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload):
-        ctx = await utils.reaction_get_ctx(self.bot, payload)
-        if ctx is None:
+    async def on_review_reaction_add(self, ctx):
+        subject = ctx["message"].embeds[0].title.split(" ", 1)[0].lower()
+        footer, review_id = ctx["message"].embeds[0].footer.text.split("|")[:2]
+        pos = footer.find("/")
+        try:
+            page = int(footer[8:pos])
+            max_page = int(footer[(pos + 1) :])
+            review_id = int(review_id.split(":")[1])
+        except (ValueError, IndexError):
+            await ctx["message"].edit(content=messages.reviews_page_e, embed=None)
             return
-
-        if (
-            ctx["message"].embeds
-            and ctx["message"].embeds[0].title is not discord.Embed.Empty
-            and re.match(".* reviews", ctx["message"].embeds[0].title)
-        ):
-            subject = ctx["message"].embeds[0].title.split(" ", 1)[0].lower()
-            footer = ctx["message"].embeds[0].footer.text.split("|")[0]
-            pos = footer.find("/")
-            try:
-                page = int(footer[8:pos])
-                max_page = int(footer[(pos + 1) :])
-            except ValueError:
-                await ctx["message"].edit(content=messages.reviews_page_e, embed=None)
-                return
-            description = ctx["message"].embeds[0].description
-            if ctx["emoji"] in ["◀", "▶", "⏪"]:
-                next_page = utils.pagination_next(ctx["emoji"], page, max_page)
-                if next_page:
-                    review = review_repo.get_subject_reviews(subject)
-                    if review.count() >= next_page:
-                        review = review.all()[next_page - 1].Review
-                        next_page = str(next_page) + "/" + str(max_page)
-                        embed = self.rev.make_embed(review, subject, description, next_page)
-                        if embed.fields[3].name == "Text page":
-                            await ctx["message"].add_reaction("🔼")
-                            await ctx["message"].add_reaction("🔽")
-                        else:
-                            for emote in ctx["message"].reactions:
-                                if emote.emoji == "🔼":
-                                    await ctx["message"].remove_reaction("🔼", self.bot.user)
-                                    await ctx["message"].remove_reaction("🔽", self.bot.user)
-                                    break
-                        await ctx["message"].edit(embed=embed)
-            elif ctx["emoji"] in ["👍", "👎", "🛑"]:
-                review = review_repo.get_subject_reviews(subject)[page - 1].Review
-                if str(ctx["member"].id) != review.member_ID:
-                    review_id = review.id
-                    if ctx["emoji"] == "👍":
-                        self.rev.add_vote(review_id, True, str(ctx["member"].id))
-                    elif ctx["emoji"] == "👎":
-                        self.rev.add_vote(review_id, False, str(ctx["member"].id))
-                    elif ctx["emoji"] == "🛑":
-                        review_repo.remove_vote(review_id, str(ctx["member"].id))
-                    page = str(page) + "/" + str(max_page)
-                    embed = self.rev.make_embed(review, subject, description, page)
-                    await ctx["message"].edit(embed=embed)
-            elif ctx["emoji"] in ["🔼", "🔽"]:
-                if ctx["message"].embeds[0].fields[3].name == "Text page":
-                    review = review_repo.get_subject_reviews(subject)
-                    if review:
-                        review = review[page - 1].Review
-                        text_page = ctx["message"].embeds[0].fields[3].value
-                        pos = ctx["message"].embeds[0].fields[3].value.find("/")
-                        max_text_page = int(text_page[(pos + 1) :])
-                        text_page = int(text_page[:pos])
-                        next_text_page = utils.pagination_next(ctx["emoji"], text_page, max_text_page)
-                        if next_text_page:
-                            page = str(page) + "/" + str(max_page)
-                            embed = self.rev.make_embed(review, subject, description, page)
-                            embed = self.rev.change_text_page(review, embed, next_text_page, max_text_page)
-                            await ctx["message"].edit(embed=embed)
-            if ctx["message"].guild:  # cannot remove reaction in DM
-                await ctx["message"].remove_reaction(ctx["emoji"], ctx["member"])
+        description = ctx["message"].embeds[0].description
+        if ctx["emoji"] in ["◀", "▶", "⏪"]:
+            max_page = await review_repo.aio.get_subject_reviews_count(subject)
+            next_page = utils.pagination_next(ctx["emoji"], page, max_page)
+            if next_page:
+                current = await review_repo.aio.get_review(review_id)
+                if ctx["emoji"] == "⏪" or current is None:
+                    review = await review_repo.aio.get_subject_review(subject, next_page)
+                else:
+                    review = await review_repo.aio.get_adjacent_review(current, ctx["emoji"] == "▶")
+                if review is not None:
+                    next_page = str(next_page) + "/" + str(max_page)
+                    embed = self.rev.make_embed(review, subject, description, next_page)
+                    if embed.fields[3].name == "Text page":
+                        await actions.add_reaction(ctx["message"], "🔼")
+                        await actions.add_reaction(ctx["message"], "🔽")
+                    else:
+                        for emote in ctx["message"].reactions:
+                            if emote.emoji == "🔼":
+                                await actions.remove_reaction(ctx["message"], "🔼", self.bot.user)
+                                await actions.remove_reaction(ctx["message"], "🔽", self.bot.user)
+                                break
+                    await actions.edit(ctx["message"], embed=embed)
+        elif ctx["emoji"] in ["👍", "👎", "🛑"]:
+            review = await review_repo.aio.get_review(review_id)
+            if review is not None and str(ctx["member"].id) != review.member_ID:
+                if ctx["emoji"] == "👍":
+                    await review_repo.aio.add_vote(review_id, True, str(ctx["member"].id))
+                elif ctx["emoji"] == "👎":
+                    await review_repo.aio.add_vote(review_id, False, str(ctx["member"].id))
+                elif ctx["emoji"] == "🛑":
+                    await review_repo.aio.remove_vote(review_id, str(ctx["member"].id))
+                # reload vote counters
+                review = await review_repo.aio.get_review(review_id)
+                page = str(page) + "/" + str(max_page)
+                embed = self.rev.make_embed(review, subject, description, page)
+                await actions.edit(ctx["message"], embed=embed)
+        elif ctx["emoji"] in ["🔼", "🔽"]:
+            if ctx["message"].embeds[0].fields[3].name == "Text page":
+                review = await review_repo.aio.get_review(review_id)
+                if review is not None:
+                    text_page = ctx["message"].embeds[0].fields[3].value
+                    pos = ctx["message"].embeds[0].fields[3].value.find("/")
+                    max_text_page = int(text_page[(pos + 1) :])
+                    text_page = int(text_page[:pos])
+                    next_text_page = utils.pagination_next(ctx["emoji"], text_page, max_text_page)
+                    if next_text_page:
+                        page = str(page) + "/" + str(max_page)
+                        embed = self.rev.make_embed(review, subject, description, page)
+                        embed = self.rev.change_text_page(review, embed, next_text_page, max_text_page)
+                        await actions.edit(ctx["message"], embed=embed)
+        if ctx["message"].guild:  # cannot remove reaction in DM
+            await actions.remove_reaction(ctx["message"], ctx["emoji"], ctx["member"])
 
 
 class Review_helper:
@@ -336,9 +330,9 @@ class Review_helper:
                     text = review.text_review[:1024]
                     embed.add_field(name="Text page", value=f"1/{pages}", inline=False)
                 embed.add_field(name="Text", value=text, inline=False)
-            likes = review_repo.get_votes_count(review.id, True)
+            likes = review.upvotes
             embed.add_field(name="Likes", value=f"👍{likes}")
-            dislikes = review_repo.get_votes_count(review.id, False)
+            dislikes = review.downvotes
             embed.add_field(name="Dislikes", value=f"👎{dislikes}")
             diff = likes - dislikes
             if diff > 0:
@@ -374,20 +368,20 @@ class Review_helper:
             review_repo.add_review(author_id, subject, tier, anonym, text)
         return True
 
-    def list_reviews(self, subject):
-        result = review_repo.get_subject(subject).first()
-        if not result:
+    async def list_reviews(self, subject):
+        # votes are counted by executor sessions, main thread session could show old counts
+        if not await review_repo.aio.get_subject(subject):
             return None
-        reviews = review_repo.get_subject_reviews(subject)
-        tier_cnt = reviews.count()
-        name = review_repo.get_subject_details(subject).name
+        tier_cnt = await review_repo.aio.get_subject_reviews_count(subject)
+        name = (await review_repo.aio.get_subject_details(subject)).name
         if tier_cnt == 0:
             description = f"{name}\n*No reviews*"
             review = None
             page = "1/1"
         else:
-            review = reviews[0].Review
-            description = f"{name}\n**Average tier:** {round(reviews[0].avg_tier)}"
+            review = await review_repo.aio.get_subject_review(subject, 1)
+            avg_tier = await review_repo.aio.get_subject_tier_avg(subject)
+            description = f"{name}\n**Average tier:** {round(avg_tier)}"
             page = f"1/{tier_cnt}"
         return self.make_embed(review, subject, description, page)
 
@@ -400,93 +394,6 @@ class Review_helper:
         else:
             return False
 
-    def add_vote(self, review_id, vote: bool, author):
-        """Add/update vote for review"""
-        relevance = review_repo.get_vote_by_author(review_id, author)
-        if not relevance or relevance.vote != vote:
-            review_repo.add_vote(review_id, vote, author)
-
-    def update_subject_types(self, link, MIT):
-        """Send request to `link`, parse page and find all subjects.
-        Add new subjects to DB, if subject already exists update its years.
-        For MITAI links please set `MIT` to True. 
-        If update succeeded return True, otherwise False
-        """
-        response = requests.get(link)
-        if response.status_code != 200:
-            return False
-        soup = BeautifulSoup(response.content, "html.parser")
-        tables = soup.select("table")
-
-        # remove last table with information about PVT and PVA subjects (applicable mainly for BIT)
-        if len(tables) % 2:
-            tables = tables[:-1]
-
-        # specialization shortcut for correct year definition in DB
-        specialization = soup.select("main p strong")[0].get_text()
-
-        sem = 1
-        year = 1
-        for table in tables:
-            rows = table.select("tbody tr")
-            for row in rows:
-                shortcut = row.find_all("th")[0].get_text()
-                # update subject DB
-                if not review_repo.get_subject(shortcut.lower()).first():
-                    review_repo.add_subject(shortcut.lower())
-                columns = row.find_all("td")
-                type = columns[2].get_text()
-                degree = "BIT"
-                for_year = "VBIT"
-                if type == "P":
-                    if MIT and year > 2:
-                        # any year
-                        for_year = f"L{specialization}"
-                    else:
-                        for_year = f"{year}{specialization}"
-                else:
-                    if MIT:
-                        for_year = "VMIT"
-                if MIT:
-                    degree = "MIT"
-                detail = review_repo.get_subject_details(shortcut.lower())
-                semester = "Z"
-                if sem == 2:
-                    semester = "L"
-                if not detail:
-                    # subject not in DB
-                    review_repo.set_subject_details(
-                        shortcut,
-                        columns[0].get_text(),  # name
-                        columns[1].get_text(),  # credits
-                        semester,
-                        columns[3].get_text(),  # end
-                        columns[0].find("a").attrs["href"],  # link
-                        type,
-                        for_year,
-                        degree,
-                    )
-                elif for_year not in detail.year.split(", "):
-                    # subject already in DB with different year (applicable mainly for MIT)
-                    if detail.type != type:
-                        type += f", {detail.type}"
-                    if detail.year:
-                        for_year += f", {detail.year}"
-                    review_repo.update_subject_type(shortcut, type, for_year)
-                elif semester not in detail.semester.split(", "):
-                    # subject already in DB with different semester (e.g. RET)
-                    semester += f", {detail.semester}"
-                    review_repo.update_subject_sem(shortcut, semester)
-                elif degree not in detail.degree.split(", "):
-                    # subject already in DB with different degree (e.g. RET)
-                    degree += f", {detail.degree}"
-                    review_repo.update_subject_degree(shortcut, degree)
-            sem += 1
-            if sem == 3:
-                year += 1
-                sem = 1
-        return True
-
 
 def setup(bot):
     bot.add_cog(Review(bot))
@@ -6,6 +6,7 @@ from config.app_config import Config
 from config.messages import Messages
 from repository.acl_repo import AclRepository
 from features.acl import Acl
+from features.action_queue import actions
 
 
 class ReactToRole(commands.Cog):
@@ -14,6 +15,37 @@ class ReactToRole(commands.Cog):
         self.bot = bot
         self.acl_repo = AclRepository()
         self.acl = Acl(self.acl_repo)
+        # message_id -> parsed role data of role messages
+        self.role_messages = {}
+        # guild_id -> {name: role or channel}, rebuilt after guild changes
+        self.role_index = {}
+        self.channel_index = {}
+
+    async def get_role_data(self, message):
+        """Returns parsed data of role message, every message is parsed only once"""
+        role_data = self.role_messages.get(message.id)
+        if role_data is None:
+            role_data = await self.get_join_role_data(message) or []
+            self.role_messages[message.id] = role_data
+        return role_data
+
+    def get_role(self, guild, name):
+        index = self.role_index.get(guild.id)
+        if index is None:
+            index = {}
+            for role in guild.roles:
+                index.setdefault(role.name, role)
+            self.role_index[guild.id] = index
+        return index.get(name)
+
+    def get_channel(self, guild, name):
+        index = self.channel_index.get(guild.id)
+        if index is None:
+            index = {}
+            for channel in guild.channels:
+                index.setdefault(channel.name, channel)
+            self.channel_index[guild.id] = index
+        return index.get(name)
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -23,43 +55,69 @@ class ReactToRole(commands.Cog):
         if message.content.startswith(Config.role_string) or\
            message.channel.id in Config.role_channels:
             role_data = await self.get_join_role_data(message)
+            self.role_messages[message.id] = role_data or []
             await self.message_role_reactions(message, role_data)
 
     @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload):
-        ctx = await utils.reaction_get_ctx(self.bot, payload)
-        if ctx is None:
-            return
+    async def on_raw_message_edit(self, payload):
+        self.role_messages.pop(payload.message_id, None)
 
-        if ctx['message'].content.startswith(Config.role_string) or\
-           ctx['channel'].id in Config.role_channels:
-            role_data = await self.get_join_role_data(ctx['message'])
-            for line in role_data:
-                if str(ctx['emoji']) == line[1]:
-                    await self.add_role_on_reaction(line[0],
-                                                    ctx['member'],
-                                                    ctx['message'].channel,
-                                                    ctx['guild'])
-                    break
-            else:
-                await ctx['message'].remove_reaction(ctx['emoji'], ctx['member'])
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.role_messages.pop(payload.message_id, None)
 
     @commands.Cog.listener()
-    async def on_raw_reaction_remove(self, payload):
-        ctx = await utils.reaction_get_ctx(self.bot, payload)
-        if ctx is None:
-            return
+    async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self.role_messages.pop(message_id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.role_index.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.role_index.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        self.role_index.pop(after.guild.id, None)
 
-        if ctx['message'].content.startswith(Config.role_string) or\
-           ctx['channel'].id in Config.role_channels:
-            role_data = await self.get_join_role_data(ctx['message'])
-            for line in role_data:
-                if str(ctx['emoji']) == line[1]:
-                    await self.remove_role_on_reaction(line[0],
-                                                       ctx['member'],
-                                                       ctx['message'].channel,
-                                                       ctx['guild'])
-                    break
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.channel_index.pop(channel.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.channel_index.pop(channel.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        self.channel_index.pop(after.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_role_reaction_add(self, ctx):
+        role_data = await self.get_role_data(ctx['message'])
+        for line in role_data:
+            if str(ctx['emoji']) == line[1]:
+                await self.add_role_on_reaction(line[0],
+                                                ctx['member'],
+                                                ctx['message'].channel,
+                                                ctx['guild'])
+                break
+        else:
+            await actions.remove_reaction(ctx['message'], ctx['emoji'], ctx['member'])
+
+    @commands.Cog.listener()
+    async def on_role_reaction_remove(self, ctx):
+        role_data = await self.get_role_data(ctx['message'])
+        for line in role_data:
+            if str(ctx['emoji']) == line[1]:
+                await self.remove_role_on_reaction(line[0],
+                                                   ctx['member'],
+                                                   ctx['message'].channel,
+                                                   ctx['guild'])
+                break
 
     # Returns list of role names and emotes that represent them
     async def get_join_role_data(self, message):
@@ -106,12 +164,12 @@ class ReactToRole(commands.Cog):
         else:
             guild = message.guild
         for line in data:
-            not_role = discord.utils.get(guild.roles, name=line[0]) is None
+            not_role = self.get_role(guild, line[0]) is None
             if isinstance(line[0], int) or line[0].isdigit():
-                not_channel = discord.utils.get(guild.channels, id=int(line[0])) is None
+                not_channel = guild.get_channel(int(line[0])) is None
             else:
                 not_channel = line[0][0] != "#" or\
-                    discord.utils.get(guild.channels, name=line[0][1:].lower()) is None
+                    self.get_channel(guild, line[0][1:].lower()) is None
             if not_role and not_channel:
                 msg = utils.fill_message("role_not_role",
                                          user=message.author.id,
@@ -119,7 +177,7 @@ class ReactToRole(commands.Cog):
                 await message.channel.send(msg)
             else:
                 try:
-                    await message.add_reaction(line[1])
+                    await actions.add_reaction(message, line[1])
                 except discord.errors.HTTPException:
                     msg = utils.fill_message("role_invalid_emote",
                                              user=message.author.id,
@@ -129,21 +187,21 @@ class ReactToRole(commands.Cog):
 
     # Adds a role for user based on reaction
     async def add_role_on_reaction(self, target, member, channel, guild):
-        role = discord.utils.get(guild.roles, name=target)
+        role = self.get_role(guild, target)
         if role is not None:
             if self.acl.get_perms(member.id, member.top_role, role.id, guild.roles):
-                await member.add_roles(role)
+                await actions.add_roles(member, role)
             else:
                 bot_room = self.bot.get_channel(Config.bot_room)
                 await bot_room.send(utils.fill_message("role_add_denied",
                                                        user=member.id, role=role.name))
         else:
             try:
-                channel = discord.utils.get(guild.channels, id=int(target))
+                channel = guild.get_channel(int(target))
             except ValueError:
                 channel = None
             if channel is None:
-                channel = discord.utils.get(guild.channels, name=target[1:].lower())
+                channel = self.get_channel(guild, target[1:].lower())
             if channel is None:
                 return
             perms = self.acl.get_perms(member.id, member.top_role, channel.id, guild.roles)
@@ -157,8 +215,7 @@ class ReactToRole(commands.Cog):
 
     # Removes a role for user based on reaction
     async def remove_role_on_reaction(self, target, member, channel, guild):
-        role = discord.utils.get(guild.roles,
-                                 name=target)
+        role = self.get_role(guild, target)
         if role is not None:
             if role in member.roles:
                 if self.acl.get_perms(member.id, member.top_role, role.id, guild.roles):
@@ -169,11 +226,11 @@ class ReactToRole(commands.Cog):
                                                            user=member.id, role=role.name))
         else:
             try:
-                channel = discord.utils.get(guild.channels, id=int(target))
+                channel = guild.get_channel(int(target))
             except ValueError:
                 channel = None
             if channel is None:
-                channel = discord.utils.get(guild.channels, name=target[1:].lower())
+                channel = self.get_channel(guild, target[1:].lower())
             if channel is None:
                 return
             perms = self.acl.get_perms(member.id, member.top_role, channel.id, guild.roles)
@@ -1,7 +1,13 @@
 from discord.ext import commands
 from features.git import Git
 from discord.message import Message
+from repository.database import database
+from repository.db_stats import stats
+from config import app_config as config
 import utils
+import datetime
+
+config = config.Config
 
 
 class System(commands.Cog):
@@ -10,7 +16,8 @@ class System(commands.Cog):
         self.git = Git()
 
         self.unloadable_cogs = [
-            'system'
+            'system',
+            'reactions'
         ]
 
     @commands.group(pass_context=True)
@@ -52,10 +59,33 @@ class System(commands.Cog):
         self.bot.reload_extension(f'cogs.{extension}')
         await ctx.send(utils.fill_message('cog_reloaded', cog=extension))
 
+    @commands.command()
+    @commands.check(utils.is_bot_owner)
+    async def dbstats(self, ctx: commands.Context, action: str = None):
+        if action == 'reset':
+            stats.reset()
+
+        pool = database.db.pool
+        with stats.lock:
+            wait_avg = stats.wait_total / stats.checkouts if stats.checkouts else 0
+            lines = [
+                pool.status(),
+                f'Checked out: {pool.checkedout()}/{pool.size() + config.db_max_overflow}',
+                f'Checkouts: {stats.checkouts}, timeouts: {stats.timeouts}',
+                f'Wait avg: {wait_avg * 1000:.2f} ms, max: {stats.wait_max * 1000:.2f} ms',
+                f'Queries since {datetime.datetime.fromtimestamp(stats.since):%d.%m. %H:%M:%S}:',
+            ]
+            queries = sorted(stats.queries.items(), key=lambda item: item[1], reverse=True)
+        lines += [f'  {name}: {count}' for name, count in queries]
+
+        for part in utils.cut_string('\n'.join(lines), 1900):
+            await ctx.send(f'```{part}```')
+
     @pull.error
     @load.error
     @unload.error
     @reload.error
+    @dbstats.error
     async def on_command_error(self, ctx: commands.Context, error):
         if isinstance(error, commands.errors.MissingRequiredArgument):
             await ctx.send('Missing argument.')
@@ -5,6 +5,7 @@ from discord import Reaction, RawReactionActionEvent, NotFound, HTTPException
 from discord.ext import commands
 from discord.ext.commands import BadArgument
 
+import utils
 from features import vote
 
 
@@ -54,9 +55,10 @@ class Vote(commands.Cog):
 
     async def handle_raw_reaction(self, payload: RawReactionActionEvent,
                                   added: bool):
-        chan = await self.bot.fetch_channel(payload.channel_id)
+        chan = self.bot.get_channel(payload.channel_id) or\
+            await self.bot.fetch_channel(payload.channel_id)
         try:
-            msg = await chan.fetch_message(payload.message_id)
+            msg = await utils.fetch_message(self.bot, chan, payload.message_id)
             usr = await self.bot.fetch_user(payload.user_id)
         except NotFound:
             return False
@@ -68,6 +70,14 @@ class Vote(commands.Cog):
 
         return False
 
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        self.voter.invalidate(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.voter.invalidate(payload.message_id)
+
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction: Reaction, user):
         if self.__handle(reaction.message.id, user.id, reaction.emoji, True,
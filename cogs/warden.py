@@ -1,18 +1,16 @@
 # stolen from rubbergoddess
 import asyncio
 import time
-from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
 
 import discord
 from discord.ext import commands
-import dhash
-from PIL import Image
 
 import utils
 from config import app_config as config, messages
+from features.image_index import HashArray, HashIndex, HashQuery, IndexedImage, hash_image
 from repository import image_repo
 
-dhash.force_pil()
 config = config.Config
 repo_i = image_repo.ImageRepository()
 
@@ -29,6 +27,21 @@ class Warden(commands.Cog):
 
         self.message_channel = None
 
+        if config.warden_engine == "numpy":
+            self.index = HashArray()
+        elif config.warden_engine == "database":
+            self.index = HashQuery(repo_i)
+        else:
+            self.index = HashIndex()
+        if not isinstance(self.index, HashQuery):
+            self.index.load(repo_i.getAll())
+
+        # image decoding and hashing is CPU heavy, keep it away from the event loop
+        self.executor = ProcessPoolExecutor(max_workers=config.warden_hash_workers or None)
+
+    def cog_unload(self):
+        self.executor.shutdown(wait=False)
+
     def doCheckRepost(self, message: discord.Message):
         return (
             message.channel.id in config.deduplication_channels
@@ -46,7 +59,8 @@ class Warden(commands.Cog):
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         if self.doCheckRepost(message):
-            repo_i.deleteByMessage(message.id)
+            await repo_i.aio.deleteByMessage(message.id)
+            self.index.remove_message(message.id)
 
             # try to detect repost embed
             messages = await message.channel.history(
@@ -62,23 +76,9 @@ class Warden(commands.Cog):
                     continue
 
     @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+    async def on_repost_reaction_add(self, ctx):
         """Delete duplicate embed if original is not a duplicate"""
-        if payload.channel_id not in config.deduplication_channels:
-            return
-        if payload.member.bot:
-            return
-        try:
-            message = (
-                await self.bot.get_guild(config.guild_id)
-                .get_channel(payload.channel_id)
-                .fetch_message(payload.message_id)
-            )
-        except Exception as e:
-            print("Warden:on_raw_reaction_add", "Message not found", e)
-            return
-        if not message or not message.author.bot:
-            return
+        message = ctx['message']
 
         for react in message.reactions:
             if react.emoji == "❎" and react.count > config.duplicate_limit:
@@ -89,31 +89,38 @@ class Warden(commands.Cog):
                     await orig.remove_reaction("🤷🏻", self.bot.user)
                     await orig.remove_reaction("🤔", self.bot.user)
                 except Exception as e:
-                    print("Warden:on_raw_reaction_add", "Could not remove bot's emote", e)
+                    print("Warden:on_repost_reaction_add", "Could not remove bot's emote", e)
                     return
                 try:
                     await message.delete()
                 except discord.errors.NotFound:
                     pass
 
-    async def saveMessageHashes(self, message: discord.Message):
-        for f in message.attachments:
-            fp = BytesIO()
-            await f.save(fp)
-            try:
-                image = Image.open(fp)
-            except OSError:
-                # not an image
-                continue
-            img_hash = dhash.dhash_int(image)
+    async def getMessageHashes(self, message: discord.Message):
+        """Download and hash all attachments of message at once,
+        returns list of (attachment, hash) for attachments that are images
+        """
+        loop = asyncio.get_event_loop()
+        files = await asyncio.gather(*[f.read() for f in message.attachments])
+        hashes = await asyncio.gather(
+            *[loop.run_in_executor(self.executor, hash_image, data) for data in files]
+        )
+        return [(f, img_hash) for f, img_hash in zip(message.attachments, hashes) if img_hash is not None]
 
-            repo_i.add_image(
+    async def saveMessageHashes(self, message: discord.Message):
+        """Hash message attachments and save them, returns list of hashes"""
+        result = []
+        for f, img_hash in await self.getMessageHashes(message):
+            image = await repo_i.aio.add_image(
                 channel_id=message.channel.id,
                 message_id=message.id,
                 attachment_id=f.id,
-                dhash=str(hex(img_hash)),
+                dhash=img_hash,
             )
-            yield img_hash
+            if image is not None:
+                self.index.add(IndexedImage.from_image(image))
+            result.append(img_hash)
+        return result
 
     @commands.group()
     @commands.check(utils.is_bot_owner)
@@ -141,41 +148,76 @@ class Warden(commands.Cog):
             except ValueError:
                 raise commands.BadArgument("Expected 'all' or positive integer")
 
-        messages = await ctx.channel.history(limit=limit).flatten()
+        checkpoint = await repo_i.aio.get_scan_checkpoint(ctx.channel.id)
+        before = discord.Object(id=checkpoint) if checkpoint is not None else None
 
-        title = "**INITIATING...**\n\nLoaded {} messages"
-        await asyncio.sleep(0.5)
+        title = "**INITIATING...**\n\n"
+        if before is not None:
+            title += f"Resuming scan before message {checkpoint}"
+        msg = await ctx.send(title)
         template = (
             "**SCANNING IN PROGRESS**\n\n"
-            "Processed **{}** of **{}** messages ({:.1f} %)\n"
+            "Processed **{}** messages\n"
             "Computed **{}** hashes"
         )
-        msg = await ctx.send(title.format(len(messages)))
 
-        ctr_nofile = 0
+        ctr_messages = 0
         ctr_hashes = 0
-        i = 0
+        batch = []
         now = time.time()
-        for i, message in enumerate(messages):
-            # update info on every 10th message
-            if i % 50 == 0:
-                await msg.edit(
-                    content=template.format(i, len(messages), (i / len(messages) * 100), ctr_hashes)
-                )
-
-            if len(message.attachments) == 0:
-                ctr_nofile += 1
-                continue
-
-            hashes = [x async for x in self.saveMessageHashes(message)]
-            ctr_hashes += len(hashes)
+        async for message in ctx.channel.history(limit=limit, before=before):
+            ctr_messages += 1
+            if len(message.attachments) > 0:
+                batch.append(message)
+
+            # history is iterated from the newest message,
+            # so the checkpoint is always the oldest processed one
+            if len(batch) >= config.warden_scan_batch:
+                ctr_hashes += await self.scanBatch(batch)
+                batch = []
+                await repo_i.aio.set_scan_checkpoint(ctx.channel.id, message.id)
+                await msg.edit(content=template.format(ctr_messages, ctr_hashes))
+
+        ctr_hashes += await self.scanBatch(batch)
+        await repo_i.aio.delete_scan_checkpoint(ctx.channel.id)
 
         await msg.edit(
             content="**SCAN COMPLETE**\n\n"
-            f"Processed **{len(messages)}** messages.\n"
+            f"Processed **{ctr_messages}** messages.\n"
             f"Computed **{ctr_hashes}** hashes in {(time.time() - now):.1f} seconds."
         )
 
+    async def scanBatch(self, messages: list):
+        """Hash attachments of messages with bounded concurrency and save them at once,
+        returns number of computed hashes
+        """
+        semaphore = asyncio.Semaphore(config.warden_scan_concurrency)
+
+        async def hash_message(message):
+            async with semaphore:
+                return await self.getMessageHashes(message)
+
+        results = await asyncio.gather(*[hash_message(message) for message in messages])
+
+        images = []
+        for message, hashes in zip(messages, results):
+            if len(hashes) == 0:
+                continue
+            attachment, img_hash = hashes[0]
+            images.append(
+                dict(
+                    channel_id=message.channel.id,
+                    message_id=message.id,
+                    attachment_id=attachment.id,
+                    dhash=img_hash,
+                )
+            )
+
+        if len(images) > 0:
+            for image in await repo_i.aio.add_images(images):
+                self.index.add(IndexedImage.from_image(image))
+        return sum(len(hashes) for hashes in results)
+
     @scan.command(name="message")
     async def scan_message(self, ctx, link):
         """Scan message attachments in whole database"""
@@ -183,27 +225,14 @@ class Warden(commands.Cog):
 
     async def checkDuplicate(self, message: discord.Message):
         """Check if uploaded files are known"""
-        hashes = [x async for x in self.saveMessageHashes(message)]
+        hashes = await self.saveMessageHashes(message)
 
         if len(message.attachments) > 0 and len(hashes) == 0:
             return
 
         duplicates = {}
-        posts = repo_i.getAll()
         for img_hash in hashes:
-            hamming_min = 128
-            duplicate = None
-            for post in posts:
-                # skip current message
-                if post.message_id == message.id:
-                    continue
-                # do the comparison
-                post_hash = int(post.dhash, 16)
-                hamming = dhash.get_num_bits_different(img_hash, post_hash)
-                if hamming < hamming_min:
-                    duplicate = post
-                    hamming_min = hamming
-
+            duplicate, hamming_min = await self.index.find_closest(img_hash, self.limit_soft, message.id)
             duplicates[duplicate] = hamming_min
 
         for duplicate, hamming_min in duplicates.items():
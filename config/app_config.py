@@ -43,11 +43,18 @@ class Config:
 
     # Database
     db_string: str = get_attr("database", "db_string")
+    db_workers: int = get_attr("database", "workers")
+    db_pool_size: int = get_attr("database", "pool_size")
+    db_max_overflow: int = get_attr("database", "max_overflow")
+    db_pool_timeout: int = get_attr("database", "pool_timeout")
+    db_pool_recycle: int = get_attr("database", "pool_recycle")
+    db_pool_pre_ping: bool = get_attr("database", "pool_pre_ping")
 
     # Base bot behavior
     command_prefix: tuple = tuple(get_attr("base", "command_prefix"))
     default_prefix: str = get_attr("base", "default_prefix")
     ignored_prefixes: tuple = tuple(get_attr("base", "ignored_prefixes"))
+    action_interval: float = get_attr("base", "action_interval")
 
     # Role IDs
     mod_role: int = get_attr("base", "mod_role")
@@ -81,10 +88,14 @@ class Config:
     karma_ban_role_id: int = get_attr("karma", "ban_role_id")
     karma_banned_channels: List[int] = get_attr("karma", "banned_channels")
     karma_grillbot_leaderboard_size: int = get_attr("karma", "grillbot_leaderboard_size")
+    karma_flush_interval: int = get_attr("karma", "flush_interval")
+    karma_flush_threshold: int = get_attr("karma", "flush_threshold")
+    karma_leaderboard_cache_ttl: int = get_attr("karma", "leaderboard_cache_ttl")
 
     # Voting
     vote_minimum: int = get_attr("vote", "minimum")
     vote_minutes: int = get_attr("vote", "minutes")
+    vote_edit_interval: int = get_attr("vote", "edit_interval")
 
     # Pin emoji count to pin
     autopin_count: int = get_attr("autopin", "count")
@@ -130,6 +141,10 @@ class Config:
     # warden
     duplicate_limit: int = get_attr("warden", "duplicate_limit")
     deduplication_channels: List[int] = get_attr("warden", "deduplication_channels")
+    warden_engine: str = get_attr("warden", "engine")
+    warden_hash_workers: int = get_attr("warden", "hash_workers")
+    warden_scan_batch: int = get_attr("warden", "scan_batch")
+    warden_scan_concurrency: int = get_attr("warden", "scan_concurrency")
 
     # week command
     starting_week: int = get_attr("week", "starting_week")
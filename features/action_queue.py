@@ -0,0 +1,100 @@
+"""Queue of outgoing Discord API calls.
+
+Calls are grouped into buckets by route, roughly matching Discord rate limit
+buckets (reactions and messages of a channel, members of a guild). Every
+bucket runs its calls one by one ordered by priority and spaced by
+`base.action_interval`, so bursts wait in the queue instead of running into 429.
+Pending calls with the same key are coalesced, e.g. several edits of one
+message end up as a single edit with the latest content.
+
+Every call returns a future with the result of the API call.
+"""
+import asyncio
+import heapq
+import itertools
+
+from config.app_config import Config
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+
+class Action:
+    def __init__(self, func, args, kwargs, key):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.future = asyncio.get_event_loop().create_future()
+
+
+class ActionQueue:
+    def __init__(self):
+        # route -> heap of (priority, sequence, action)
+        self.buckets = {}
+        # route -> worker task of bucket
+        self.workers = {}
+        # key -> pending action, for coalescing
+        self.pending = {}
+        self.counter = itertools.count()
+
+    def submit(self, route, func, *args, priority=NORMAL, key=None, **kwargs):
+        """Queue `func(*args, **kwargs)`, returns future of its result.
+        If action with the same key is still waiting, it's updated instead,
+        keyword arguments are merged and the new ones win.
+        """
+        action = self.pending.get(key) if key is not None else None
+        if action is not None:
+            action.func = func
+            action.args = args
+            action.kwargs = {**action.kwargs, **kwargs}
+            return action.future
+
+        action = Action(func, args, kwargs, key)
+        if key is not None:
+            self.pending[key] = action
+        heapq.heappush(self.buckets.setdefault(route, []), (priority, next(self.counter), action))
+        if route not in self.workers:
+            self.workers[route] = asyncio.ensure_future(self.work(route))
+        return action.future
+
+    async def work(self, route):
+        bucket = self.buckets[route]
+        try:
+            while bucket:
+                _, _, action = heapq.heappop(bucket)
+                if action.key is not None:
+                    self.pending.pop(action.key, None)
+                try:
+                    result = await action.func(*action.args, **action.kwargs)
+                except Exception as e:
+                    # future of cancelled caller is already done
+                    if not action.future.done():
+                        action.future.set_exception(e)
+                else:
+                    if not action.future.done():
+                        action.future.set_result(result)
+                await asyncio.sleep(Config.action_interval)
+        finally:
+            del self.buckets[route]
+            del self.workers[route]
+
+    def add_reaction(self, message, emoji, priority=LOW):
+        return self.submit(('reactions', message.channel.id), message.add_reaction, emoji,
+                           priority=priority)
+
+    def remove_reaction(self, message, emoji, member, priority=NORMAL):
+        return self.submit(('reactions', message.channel.id), message.remove_reaction, emoji, member,
+                           priority=priority)
+
+    def edit(self, message, priority=HIGH, **fields):
+        return self.submit(('messages', message.channel.id), message.edit,
+                           priority=priority, key=('edit', message.id), **fields)
+
+    def add_roles(self, member, *roles, priority=HIGH):
+        return self.submit(('members', member.guild.id), member.add_roles, *roles,
+                           priority=priority)
+
+
+actions = ActionQueue()
@@ -0,0 +1,251 @@
+"""In-memory Hamming distance indexes over image dhashes.
+
+HashIndex uses multi-index hashing: the 128-bit dhash is split into 8 chunks
+of 16 bits and every chunk has its own lookup table. If two hashes differ in
+at most `r` bits, at least one of their chunks differs in at most `r // 8`
+bits, so it is enough to probe every table with the chunks within that
+distance and verify the candidates with a full comparison.
+
+HashArray keeps the hashes in a contiguous uint64 array and compares
+all of them in one vectorized pass.
+
+HashQuery keeps nothing in memory and lets the database compute
+the distances.
+"""
+from io import BytesIO
+from itertools import combinations
+
+import dhash
+import numpy as np
+from PIL import Image
+
+dhash.force_pil()
+
+HASH_BITS = 128
+CHUNK_BITS = 16
+CHUNK_COUNT = HASH_BITS // CHUNK_BITS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def hash_image(data: bytes):
+    """Compute dhash of image file contents, returns None if it is not an image.
+    Runs in a worker process, so it has to stay a module-level function.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+    except OSError:
+        return None
+    return dhash.dhash_int(image)
+
+
+class IndexedImage:
+    """Copy of the `images` row data needed for repost announcements"""
+
+    def __init__(self, attachment_id, message_id, channel_id, timestamp, dhash: int):
+        self.attachment_id = attachment_id
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.timestamp = timestamp
+        self.dhash = dhash
+
+    @classmethod
+    def from_image(cls, image):
+        return cls(image.attachment_id, image.message_id, image.channel_id,
+                   image.timestamp, image.dhash)
+
+
+def split_hash(dhash: int):
+    return [(dhash >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNK_COUNT)]
+
+
+def chunk_neighbours(chunk: int, distance: int):
+    """Yield all chunk values within `distance` bits from `chunk`"""
+    for bits in range(distance + 1):
+        for flipped in combinations(range(CHUNK_BITS), bits):
+            value = chunk
+            for bit in flipped:
+                value ^= 1 << bit
+            yield value
+
+
+class HashIndex:
+    def __init__(self):
+        self.images = {}
+        self.messages = {}
+        self.tables = [{} for _ in range(CHUNK_COUNT)]
+
+    def __len__(self):
+        return len(self.images)
+
+    def load(self, images):
+        for image in images:
+            self.add(IndexedImage.from_image(image))
+
+    def add(self, image: IndexedImage):
+        if image.attachment_id in self.images:
+            self.remove(image.attachment_id)
+
+        self.images[image.attachment_id] = image
+        self.messages.setdefault(image.message_id, set()).add(image.attachment_id)
+        for table, chunk in zip(self.tables, split_hash(image.dhash)):
+            table.setdefault(chunk, set()).add(image.attachment_id)
+
+    def remove(self, attachment_id):
+        image = self.images.pop(attachment_id, None)
+        if image is None:
+            return
+
+        attachments = self.messages.get(image.message_id)
+        attachments.discard(attachment_id)
+        if not attachments:
+            del self.messages[image.message_id]
+
+        for table, chunk in zip(self.tables, split_hash(image.dhash)):
+            bucket = table[chunk]
+            bucket.discard(attachment_id)
+            if not bucket:
+                del table[chunk]
+
+    def remove_message(self, message_id):
+        for attachment_id in list(self.messages.get(message_id, ())):
+            self.remove(attachment_id)
+
+    async def find_closest(self, dhash: int, max_distance: int, skip_message_id=None):
+        """Return the closest image within `max_distance` bits and its distance.
+        If there is no such image, returns (None, HASH_BITS).
+        """
+        chunk_distance = max_distance // CHUNK_COUNT
+        candidates = set()
+        for table, chunk in zip(self.tables, split_hash(dhash)):
+            for value in chunk_neighbours(chunk, chunk_distance):
+                bucket = table.get(value)
+                if bucket:
+                    candidates |= bucket
+
+        closest = None
+        hamming_min = HASH_BITS
+        for attachment_id in candidates:
+            image = self.images[attachment_id]
+            if image.message_id == skip_message_id:
+                continue
+            hamming = bin(dhash ^ image.dhash).count("1")
+            if hamming < hamming_min:
+                closest = image
+                hamming_min = hamming
+
+        if hamming_min > max_distance:
+            return None, HASH_BITS
+        return closest, hamming_min
+
+
+# popcount lookup table for numpy versions without np.bitwise_count
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    """Number of set bits in every uint64 item of `values`"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    bytes_view = values.view(np.uint8).reshape(values.shape + (8,))
+    return POPCOUNT_TABLE[bytes_view].sum(axis=-1, dtype=np.uint8)
+
+
+def to_words(dhash: int):
+    return [dhash & 0xFFFFFFFFFFFFFFFF, dhash >> 64]
+
+
+class HashArray:
+    def __init__(self, capacity=1024):
+        self.images = []
+        self.positions = {}
+        self.messages = {}
+        self.hashes = np.zeros((capacity, 2), dtype=np.uint64)
+        self.message_ids = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.images)
+
+    def load(self, images):
+        for image in images:
+            self.add(IndexedImage.from_image(image))
+
+    def add(self, image: IndexedImage):
+        if image.attachment_id in self.positions:
+            self.remove(image.attachment_id)
+
+        position = len(self.images)
+        if position == len(self.hashes):
+            self.hashes = np.resize(self.hashes, (2 * position, 2))
+            self.message_ids = np.resize(self.message_ids, 2 * position)
+
+        self.hashes[position] = to_words(image.dhash)
+        self.message_ids[position] = image.message_id
+        self.images.append(image)
+        self.positions[image.attachment_id] = position
+        self.messages.setdefault(image.message_id, set()).add(image.attachment_id)
+
+    def remove(self, attachment_id):
+        position = self.positions.pop(attachment_id, None)
+        if position is None:
+            return
+
+        image = self.images[position]
+        attachments = self.messages.get(image.message_id)
+        attachments.discard(attachment_id)
+        if not attachments:
+            del self.messages[image.message_id]
+
+        # move the last image into the freed slot
+        last = self.images.pop()
+        if last is not image:
+            self.images[position] = last
+            self.positions[last.attachment_id] = position
+            self.hashes[position] = self.hashes[len(self.images)]
+            self.message_ids[position] = self.message_ids[len(self.images)]
+
+    def remove_message(self, message_id):
+        for attachment_id in list(self.messages.get(message_id, ())):
+            self.remove(attachment_id)
+
+    async def find_closest(self, dhash: int, max_distance: int, skip_message_id=None):
+        """Return the closest image within `max_distance` bits and its distance.
+        If there is no such image, returns (None, HASH_BITS).
+        """
+        size = len(self.images)
+        if size == 0:
+            return None, HASH_BITS
+
+        query = np.array(to_words(dhash), dtype=np.uint64)
+        distances = popcount(self.hashes[:size] ^ query).sum(axis=1, dtype=np.int32)
+        if skip_message_id is not None:
+            distances[self.message_ids[:size] == skip_message_id] = HASH_BITS + 1
+
+        position = int(np.argmin(distances))
+        hamming = int(distances[position])
+        if hamming > max_distance:
+            return None, HASH_BITS
+        return self.images[position], hamming
+
+
+class HashQuery:
+    def __init__(self, image_repository):
+        self.repo = image_repository
+
+    def load(self, images):
+        pass
+
+    def add(self, image: IndexedImage):
+        pass
+
+    def remove_message(self, message_id):
+        pass
+
+    async def find_closest(self, dhash: int, max_distance: int, skip_message_id=None):
+        """Return the closest image within `max_distance` bits and its distance.
+        If there is no such image, returns (None, HASH_BITS).
+        """
+        closest = await self.repo.aio.getClosest(dhash, max_distance, skip_message_id)
+        if closest is None:
+            return None, HASH_BITS
+        image, hamming = closest
+        return IndexedImage.from_image(image), hamming
@@ -1,4 +1,3 @@
-import asyncio
 import datetime
 import math
 import re
@@ -11,6 +10,7 @@ from emoji import demojize
 import utils
 from config import app_config as config, messages
 from features.base_feature import BaseFeature
+from features.scheduler import scheduler
 from repository.karma_repo import KarmaRepository
 from repository.database.karma import Karma as Database_karma
 
@@ -39,8 +39,11 @@ class Karma(BaseFeature):
     def __init__(self, bot: Bot, karma_repository: KarmaRepository):
         super().__init__(bot)
         self.repo = karma_repository
+        scheduler.register("karma_vote", self.emoji_vote_result)
 
-    async def emoji_process_vote(self, channel, emoji):
+    async def emoji_process_vote(self, channel, emoji, revote=False):
+        """Starts vote about value of emoji, result is processed by scheduled
+        "karma_vote" job in `emoji_vote_result`"""
         delay = cfg.vote_minutes * 60
         message = utils.fill_message("karma_vote_message", emote=str(emoji))
         message += '\n'
@@ -49,10 +52,20 @@ class Karma(BaseFeature):
         await message.add_reaction("✅")
         await message.add_reaction("❌")
         await message.add_reaction("0⃣")
-        await asyncio.sleep(delay)
-
-        message = await channel.fetch_message(message.id)
 
+        await scheduler.schedule(
+            "karma_vote",
+            datetime.datetime.now() + datetime.timedelta(seconds=delay),
+            {
+                "channel_id": channel.id,
+                "message_id": message.id,
+                "emoji_id": utils.str_emoji_id(emoji),
+                "emote": str(emoji),
+                "revote": revote,
+            })
+
+    def count_vote(self, message):
+        """Returns value voted in karma vote message, None if not enough members voted"""
         plus = 0
         minus = 0
         neutral = 0
@@ -75,6 +88,22 @@ class Karma(BaseFeature):
         else:
             return 0
 
+    async def emoji_vote_result(self, payload):
+        """Handler of scheduled "karma_vote" jobs"""
+        channel = self.bot.get_channel(payload["channel_id"])
+        message = await channel.fetch_message(payload["message_id"])
+        vote_value = self.count_vote(message)
+
+        if vote_value is None:
+            if not payload["revote"]:
+                await self.repo.aio.remove_emoji(payload["emoji_id"])
+            await channel.send(utils.fill_message("karma_vote_notpassed",
+                               emote=payload["emote"], minimum=str(cfg.vote_minimum)))
+        else:
+            await self.repo.aio.set_emoji_value(payload["emoji_id"], vote_value)
+            await channel.send(utils.fill_message("karma_vote_result",
+                               emote=payload["emote"], result=str(vote_value)))
+
     async def emoji_vote_value(self, message):
         if len(message.content.split()) != 2:
             await message.channel.send(
@@ -92,23 +121,10 @@ class Karma(BaseFeature):
 
                 if len(e) == 0:
                     self.repo.set_emoji_value(server_emoji, 0)
-                    vote_value = await self.emoji_process_vote(message.channel,
-                                                               server_emoji)
-                    emoji = server_emoji  # Save for use outside loop
+                    await self.emoji_process_vote(message.channel, server_emoji)
                     break
         else:
             await message.channel.send(msg.karma_vote_allvoted)
-            return
-
-        if vote_value is None:
-            self.repo.remove_emoji(emoji)
-            await message.channel.send(utils.fill_message("karma_vote_notpassed",
-                                       emote=str(emoji), minimum=str(cfg.vote_minimum)))
-
-        else:
-            self.repo.set_emoji_value(emoji, vote_value)
-            await message.channel.send(utils.fill_message("karma_vote_result",
-                                       emote=str(emoji), result=str(vote_value)))
 
     async def emoji_revote_value(self, message):
         content = message.content.split()
@@ -128,15 +144,7 @@ class Karma(BaseFeature):
                 await message.channel.send(msg.karma_emote_not_found)
                 return
 
-        vote_value = await self.emoji_process_vote(message.channel, emoji)
-
-        if vote_value is not None:
-            self.repo.set_emoji_value(emoji, vote_value)
-            await message.channel.send(utils.fill_message("karma_vote_result",
-                                       emote=str(emoji), result=str(vote_value)))
-        else:
-            await message.channel.send(utils.fill_message("karma_vote_notpassed",
-                                       emote=str(emoji), minimum=str(cfg.vote_minimum)))
+        await self.emoji_process_vote(message.channel, emoji, revote=True)
 
     async def emoji_get_value(self, message):
         content = message.content.split()
@@ -239,7 +247,7 @@ class Karma(BaseFeature):
                                                               input=input_string[2]))
                 return
             for member in message.mentions:
-                self.repo.update_karma(member, message.author, number)
+                await self.repo.aio.update_karma(member, message.author, number)
             if number >= 0:
                 await message.channel.send(msg.karma_give_success)
             else:
@@ -257,7 +265,7 @@ class Karma(BaseFeature):
             from_user: Member = message.mentions[0]
             to_user: Member = message.mentions[1]
 
-            transfered = self.repo.transfer_karma(from_user, to_user)
+            transfered = await self.repo.aio.transfer_karma(from_user, to_user)
             formated_message = utils.fill_message("karma_transfer_complete", from_user=from_user.name,
                                                   to_user=to_user.name, karma=transfered.karma,
                                                   positive=transfered.positive, negative=transfered.negative)
@@ -267,10 +275,10 @@ class Karma(BaseFeature):
             await self.reply_to_channel(message.channel, msg.karma_transfer_format)
             return
 
-    def karma_get(self, author, target=None):
+    async def karma_get(self, author, target=None):
         if target is None:
             target = author
-        k = self.repo.get_karma(target.id)
+        k = await self.repo.aio.get_karma(target.id)
         return utils.fill_message(
             "karma",
             user=author.id,
@@ -356,7 +364,7 @@ class Karma(BaseFeature):
         else:
             raise Exception('Action neni get/give')
 
-        output = self.gen_leaderboard_content(attribute, start, column)
+        output = await self.gen_leaderboard_content(attribute, start, column)
 
         embed = discord.Embed(title=title, description=output)
         embed.timestamp = datetime.datetime.now(tz=datetime.timezone.utc)
@@ -371,8 +379,8 @@ class Karma(BaseFeature):
         await message.add_reaction("◀")
         await message.add_reaction("▶")
 
-    def gen_leaderboard_content(self, attribute, start, column):
-        board = self.repo.get_leaderboard(attribute, start-1)
+    async def gen_leaderboard_content(self, attribute, start, column):
+        board = await self.repo.aio.get_leaderboard(attribute, start-1)
         guild = self.bot.get_guild(cfg.guild_id)
 
         output = ""
@@ -387,7 +395,7 @@ class Karma(BaseFeature):
 
         return output
 
-    def get_db_from_title(self, embed_title):
+    async def get_db_from_title(self, embed_title):
         if re.match(r".* GIVINGBOARD .*", embed_title):
             column = 'positive'
             attribute = Database_karma.positive.desc()
@@ -402,5 +410,5 @@ class Karma(BaseFeature):
             attribute = Database_karma.karma
         else:
             return None
-        max_page = self.repo.get_leaderboard_max()
+        max_page = await self.repo.aio.get_leaderboard_max()
         return column, attribute, max_page
@@ -0,0 +1,90 @@
+"""Jobs planned to a given time, stored in DB so they survive restarts.
+
+Features register a handler for their kind of job and schedule jobs with
+a JSON serializable payload. A single task sleeps until the nearest job
+is due, jobs are loaded from DB again when the bot starts.
+"""
+import asyncio
+import heapq
+import traceback
+from datetime import datetime
+
+from repository.scheduler_repo import SchedulerRepository
+
+
+class Scheduler:
+    def __init__(self):
+        self.repo = SchedulerRepository()
+        # kind -> async handler(payload)
+        self.handlers = {}
+        # heap of (run_at, job id, kind, payload)
+        self.jobs = []
+        # ids of jobs in the heap
+        self.job_ids = set()
+        self.wakeup = None
+        self.task = None
+
+    def register(self, kind: str, handler):
+        """Set handler of jobs of `kind`, registering again replaces it (cog reload)"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Load pending jobs from DB and start waiting for them"""
+        if self.task is not None:
+            return
+        for job in self.repo.get_jobs():
+            self.push(job.run_at, job.id, job.kind, job.payload)
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.ensure_future(self.run())
+
+    async def schedule(self, kind: str, run_at: datetime, payload: dict):
+        """Plan job of `kind` to `run_at` (local time), returns id of the job"""
+        job = await self.repo.aio.add_job(kind, run_at, payload)
+        # before start the job is loaded from DB together with the others
+        if self.task is not None:
+            self.push(run_at, job.id, kind, payload)
+            self.wakeup.set()
+        return job.id
+
+    def push(self, run_at, id, kind, payload):
+        # start() may load a job which is being scheduled just now
+        if id in self.job_ids:
+            return
+        self.job_ids.add(id)
+        heapq.heappush(self.jobs, (run_at, id, kind, payload))
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            if not self.jobs:
+                await self.wakeup.wait()
+                continue
+
+            delay = (self.jobs[0][0] - datetime.now()).total_seconds()
+            if delay > 0:
+                try:
+                    # new job may be due sooner
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, id, kind, payload = heapq.heappop(self.jobs)
+            self.job_ids.discard(id)
+            asyncio.ensure_future(self.execute(id, kind, payload))
+
+    async def execute(self, id, kind, payload):
+        handler = self.handlers.get(kind)
+        if handler is None:
+            # keep job in DB, it's loaded again after restart
+            print(f"Scheduler: no handler for job {id} of kind {kind}")
+            return
+        try:
+            await handler(payload)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            await self.repo.aio.delete_job(id)
+
+
+scheduler = Scheduler()
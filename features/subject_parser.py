@@ -0,0 +1,67 @@
+"""Parser of FIT study programme pages.
+
+It doesn't need network or DB, so it runs in a worker thread during subject
+sync and can be tested on saved pages.
+"""
+from collections import namedtuple
+
+from bs4 import BeautifulSoup
+
+
+Subject_row = namedtuple(
+    "Subject_row", ["shortcut", "name", "credits", "semester", "end", "card", "type", "year", "degree"]
+)
+
+
+def parse_subjects(html, MIT: bool):
+    """Returns Subject_row of every subject in tables of study programme page.
+    For MITAI pages please set `MIT` to True.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    tables = soup.select("table")
+
+    # remove last table with information about PVT and PVA subjects (applicable mainly for BIT)
+    if len(tables) % 2:
+        tables = tables[:-1]
+
+    # specialization shortcut for correct year definition in DB
+    specialization = soup.select("main p strong")[0].get_text()
+
+    subjects = []
+    sem = 1
+    year = 1
+    for table in tables:
+        for row in table.select("tbody tr"):
+            shortcut = row.find_all("th")[0].get_text()
+            columns = row.find_all("td")
+            type = columns[2].get_text()
+            degree = "BIT"
+            for_year = "VBIT"
+            if type == "P":
+                if MIT and year > 2:
+                    # any year
+                    for_year = f"L{specialization}"
+                else:
+                    for_year = f"{year}{specialization}"
+            else:
+                if MIT:
+                    for_year = "VMIT"
+            if MIT:
+                degree = "MIT"
+            credits = columns[1].get_text().strip()
+            subjects.append(Subject_row(
+                shortcut=shortcut,
+                name=columns[0].get_text(),
+                credits=int(credits) if credits.isdigit() else None,
+                semester="Z" if sem == 1 else "L",
+                end=columns[3].get_text(),
+                card=columns[0].find("a").attrs["href"],
+                type=type,
+                year=for_year,
+                degree=degree,
+            ))
+        sem += 1
+        if sem == 3:
+            year += 1
+            sem = 1
+    return subjects
@@ -0,0 +1,72 @@
+"""Synchronization of subjects with study programme pages of FIT.
+
+Pages are fetched concurrently by one HTTP session per sync. ETag and
+Last-Modified of every page are kept in memory together with its parsed
+subjects, so pages which didn't change are answered by 304 and not parsed
+again. Parsing runs in a worker thread, see features/subject_parser.py.
+All subjects are then applied to DB as one bulk upsert.
+"""
+import asyncio
+
+import aiohttp
+
+from features.subject_parser import parse_subjects
+from repository.review_repo import ReviewRepository
+
+# BIT programme and MIT specializations
+BIT_LINK = "https://www.fit.vut.cz/study/program/18/.cs"
+MIT_LINKS = [f"https://www.fit.vut.cz/study/field/{id}/.cs" for id in range(31, 47)]
+
+
+class SubjectSync:
+    def __init__(self):
+        self.repo = ReviewRepository()
+        # link -> (ETag, Last-Modified, parsed subjects) of pages written to DB
+        self.pages = {}
+
+    async def fetch(self, session, link, MIT: bool):
+        """Returns (ETag, Last-Modified, subjects) of page, or None if it didn't change
+        since the last successful sync
+        """
+        headers = {}
+        cached = self.pages.get(link)
+        if cached is not None:
+            etag, modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if modified:
+                headers["If-Modified-Since"] = modified
+
+        async with session.get(link, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                return None
+            response.raise_for_status()
+            html = await response.read()
+            etag = response.headers.get("ETag")
+            modified = response.headers.get("Last-Modified")
+
+        loop = asyncio.get_event_loop()
+        subjects = await loop.run_in_executor(None, parse_subjects, html, MIT)
+        return etag, modified, subjects
+
+    async def sync(self):
+        """Update subjects from all pages, returns False if some page couldn't be fetched"""
+        links = [(BIT_LINK, False)] + [(link, True) for link in MIT_LINKS]
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
+                pages = await asyncio.gather(*[self.fetch(session, link, MIT) for link, MIT in links])
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+        if all(page is None for page in pages):
+            return True
+        # unchanged pages are taken from the last sync, all subjects are written together
+        pages = {link: page or self.pages[link] for (link, _), page in zip(links, pages)}
+        subjects = [subject for _, _, page in pages.values() for subject in page]
+        await self.repo.aio.sync_subjects(subjects)
+        # validators are kept only when the pages are in DB, otherwise the next sync gets 304
+        self.pages.update(pages)
+        return True
+
+
+subject_sync = SubjectSync()
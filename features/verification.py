@@ -10,6 +10,7 @@ from discord.ext.commands import Bot
 import utils
 from config.app_config import Config
 from config.messages import Messages
+from features.action_queue import actions
 from features.base_feature import BaseFeature
 from repository.user_repo import UserRepository
 
@@ -53,7 +54,7 @@ class Verification(BaseFeature):
         self.send_mail(login + mail_postfix, email_message)
 
         # Save the newly generated code into the database
-        self.repo.save_sent_code(login, code)
+        await self.repo.aio.save_sent_code(login, code)
 
         await message.channel.send(utils.fill_message("verify_send_success",
                                    user=message.author.id, mail=mail_postfix))
@@ -78,7 +79,7 @@ class Verification(BaseFeature):
             if login[0] == 'x':
                 # VUT
                 # Check if the login we got is in the database
-                if self.repo.has_unverified_login(login):
+                if await self.repo.aio.has_unverified_login(login):
                     await self.gen_code_and_send_mail(message, login,
                                                       "@stud.fit.vutbr.cz")
                 else:
@@ -112,11 +113,11 @@ class Verification(BaseFeature):
                         return
                     except discord.errors.Forbidden:
                         return
-                if self.repo.get_user(login, status=2) is None and\
-                   self.repo.get_user(login, status=0) is None:
+                if await self.repo.aio.get_user(login, status=2) is None and\
+                   await self.repo.aio.get_user(login, status=0) is None:
 
-                    if self.repo.get_user(login, status=1) is None:
-                        self.repo.add_user(login, "MUNI", status=1)
+                    if await self.repo.aio.get_user(login, status=1) is None:
+                        await self.repo.aio.add_user(login, "MUNI", status=1)
 
                     await self.gen_code_and_send_mail(message, login,
                                                       "@mail.muni.cz")
@@ -209,7 +210,7 @@ class Verification(BaseFeature):
                                            user=message.author.id, emote=str(fp)))
                 return
 
-            new_user = self.repo.get_user(login)
+            new_user = await self.repo.aio.get_user(login)
 
             if new_user is not None:
                 # Check the code
@@ -262,10 +263,9 @@ class Verification(BaseFeature):
                     year = discord.utils.get(guild.roles, name=year)
                     member = guild.get_member(message.author.id)
 
-                await member.add_roles(verify)
-                await member.add_roles(year)
+                await actions.add_roles(member, verify, year)
 
-                self.repo.save_verified(login, message.author.id)
+                await self.repo.aio.save_verified(login, message.author.id)
 
                 await member.send(utils.fill_message("verify_verify_success",
                                                      user=message.author.id))
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from datetime import datetime
 
 import discord
@@ -6,6 +7,9 @@ from discord import HTTPException, Reaction, User, Message
 from discord.ext.commands import Bot, Context
 
 from config import messages
+from config.app_config import Config
+from features.action_queue import actions
+from features.scheduler import scheduler
 from features.base_feature import BaseFeature
 
 import utils
@@ -22,9 +26,27 @@ class MessageData:
                and len(self.question) != 0 and len(self.options) != 0
 
 
+class PollState:
+    """Parsed vote message and bot's tally message of running poll"""
+
+    def __init__(self, message: Message, data: MessageData, bot_msg: Message = None):
+        self.message = message
+        self.data = data
+        self.bot_msg = bot_msg
+        self.last_edit = 0
+        self.update_task = None
+
+    def cancel(self):
+        if self.update_task is not None:
+            self.update_task.cancel()
+
+
 class Vote(BaseFeature):
     def __init__(self, bot: Bot):
         super().__init__(bot)
+        # vote message id -> PollState
+        self.polls = {}
+        scheduler.register("vote", self.close_vote)
 
     # There might be a better way to do this.
     @staticmethod
@@ -132,26 +154,39 @@ class Vote(BaseFeature):
 
         for o in data.options:
             try:
-                await context.message.add_reaction(o[0])
+                await actions.add_reaction(context.message, o[0])
             except HTTPException:
                 await context.message.channel.send(
                     messages.Messages.vote_not_emoji
                                      .format(not_emoji=o[0]))
 
-        await context.message.channel.send(messages.Messages.vote_none)
+        bot_msg = await context.message.channel.send(messages.Messages.vote_none)
+        raw_data = await self.get_message_data_raw(context.message)
+        if raw_data is not None and raw_data.is_valid():
+            self.polls[context.message.id] = PollState(context.message, raw_data, bot_msg)
 
         if data.date is not None:
-            sec = (data.date - datetime.now()).total_seconds()
-            asyncio.ensure_future(
-                self.send_winning_msg(context.channel.id, context.message.id,
-                                      sec))
+            await scheduler.schedule("vote", data.date, {
+                "channel_id": context.channel.id,
+                "message_id": context.message.id,
+            })
 
     @staticmethod
     def singularise(msg: str):
         return msg.replace("1 hlasy.", "1 hlasem.")
 
-    async def send_winning_msg(self, channel_id, vote_msg_id, timeout):
-        await asyncio.sleep(timeout)
+    def invalidate(self, vote_msg_id):
+        """Drops poll state, it's parsed again on the next reaction"""
+        state = self.polls.pop(vote_msg_id, None)
+        if state is not None:
+            state.cancel()
+
+    async def close_vote(self, payload):
+        """Handler of scheduled "vote" jobs"""
+        await self.send_winning_msg(payload["channel_id"], payload["message_id"])
+
+    async def send_winning_msg(self, channel_id, vote_msg_id):
+        self.invalidate(vote_msg_id)
         chan = await self.bot.fetch_channel(channel_id)
         target_msg = await chan.fetch_message(vote_msg_id)
         data = await self.get_message_data_raw(target_msg)
@@ -200,46 +235,81 @@ class Vote(BaseFeature):
                 )
             )
 
-    # The lookups in this method are ineffective.
-    # We could definitely get rid of all the iterations.
+    async def get_poll(self, target_msg: Message):
+        """Returns state of poll in message, None if it isn't a valid vote"""
+        state = self.polls.get(target_msg.id)
+        if state is not None:
+            state.message = target_msg
+            return state
+
+        data = await self.get_message_data_raw(target_msg)
+        if data is None or not data.is_valid():
+            return None
+
+        bot_msg = await target_msg.channel.history(
+            limit=3,
+            after=target_msg.created_at
+        ).get(author__id=self.bot.user.id)
+
+        state = PollState(target_msg, data, bot_msg)
+        self.polls[target_msg.id] = state
+        return state
+
     async def handle_reaction(self, reaction: Reaction, user: User,
                               added: bool):
         target_msg = reaction.message
-        data = await self.get_message_data_raw(target_msg)
+        state = await self.get_poll(target_msg)
 
-        if data is None or not data.is_valid():
+        if state is None:
             return
+        data = state.data
 
         if data.date is not None and data.date < datetime.now():
             if added:
-                await reaction.message.remove_reaction(reaction.emoji, user)
+                await actions.remove_reaction(reaction.message, reaction.emoji, user)
             return
 
         if not any(str(reaction.emoji) == a[0] for a in data.options):
             if added:
-                await reaction.message.remove_reaction(reaction.emoji, user)
+                await actions.remove_reaction(reaction.message, reaction.emoji, user)
             return
         else:
             if added and not any(a.me and a.emoji == reaction.emoji for a in
                                  target_msg.reactions):
-                await target_msg.add_reaction(reaction.emoji)
-
-        bot_msg = await target_msg.channel.history(
-            limit=3,
-            after=target_msg.created_at
-        ).get(author__id=self.bot.user.id)
+                await actions.add_reaction(target_msg, reaction.emoji)
 
-        if bot_msg is None:
+        if state.bot_msg is None:
             return
 
-        r = [x for x in target_msg.reactions if
+        self.schedule_update(state)
+
+    def schedule_update(self, state: PollState):
+        """Update tally at most once per vote.edit_interval seconds,
+        reactions coming in the meantime are included in the next update"""
+        if state.update_task is not None:
+            return
+        delay = state.last_edit + Config.vote_edit_interval - time.monotonic()
+        state.update_task = asyncio.ensure_future(self.update_later(state, max(delay, 0)))
+
+    async def update_later(self, state: PollState, delay):
+        await asyncio.sleep(delay)
+        state.update_task = None
+        state.last_edit = time.monotonic()
+        await self.update_tally(state)
+
+    async def update_tally(self, state: PollState):
+        data = state.data
+        bot_msg = state.bot_msg
+        r = [x for x in state.message.reactions if
              any(str(x.emoji) == a[0] for a in data.options)]
+        if not r:
+            return
 
         most_voted = max(r, key=lambda x: x.count)
         all_most_voted = list(filter(lambda x: x.count == most_voted.count, r))
 
         if most_voted.count == 1:
-            await bot_msg.edit(content=messages.Messages.vote_none)
+            await actions.edit(bot_msg, content=messages.Messages.vote_none)
             return
 
         if len(all_most_voted) == 1:
@@ -247,7 +317,8 @@ class Vote(BaseFeature):
                 [a[1] for a in data.options if str(most_voted.emoji) == a[0]][
                     0]
 
-            await bot_msg.edit(
+            await actions.edit(
+                bot_msg,
                 content=self.singularise(utils.fill_message(
                     "vote_winning",
                     winning_emoji=most_voted.emoji,
@@ -259,7 +330,8 @@ class Vote(BaseFeature):
             for e in all_most_voted:
                 emoji_str += str(e.emoji) + ", "
             emoji_str = emoji_str[:-2]
-            await bot_msg.edit(
+            await actions.edit(
+                bot_msg,
                 content=self.singularise(
                     utils.fill_message(
                         "vote_winning_multiple",
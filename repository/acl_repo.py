@@ -4,66 +4,98 @@ from repository.database.acl import (Acl_groups, Acl_rules, Acl_role_binding,
                                      Acl_user_binding)
 
 
-class AclRepository(BaseRepository):
-
-    def find_user_exception(self, member_id, target_id):
-        user_exceptions = session.query(Acl_user_binding).\
-            filter(Acl_user_binding.user_id == str(member_id)).all()
-
-        for exception in user_exceptions:
-            result = self.find_target_exception(exception.acl_group_id,
-                                                target_id)
-            if result is not None:
-                return exception.perms
-
-        return None
+class Acl_permissions():
+    """Whole ACL in memory, perms of bindings are resolved for every target
+    they apply to, so lookups are single dict probes.
+    """
+
+    def __init__(self, groups, rules, role_bindings, user_bindings):
+        children = {}
+        for group in groups:
+            children.setdefault(group.parent_id, []).append(group.id)
+
+        targets = {}
+        for rule in rules:
+            targets.setdefault(rule.acl_group_id, set()).add(rule.acl_snowflake)
+
+        # targets of group and all of its descendants
+        self.group_targets = {}
+        for group in groups:
+            self.group_targets[group.id] = self.collect_targets(group.id, children, targets)
+
+        # (subject, target) -> perms, the first binding by id wins
+        self.users = {}
+        self.role_ids = {}
+        self.role_names = {}
+        for binding in user_bindings:
+            self.bind(self.users, binding.user_id, binding)
+        for binding in role_bindings:
+            if binding.role_id is not None:
+                self.bind(self.role_ids, binding.role_id, binding)
+            else:
+                self.bind(self.role_names, binding.role_name, binding)
 
-    def find_target_exception(self, acl_group_id, target_id):
-        stack = [acl_group_id]
-        while True:
+    def collect_targets(self, group_id, children, targets):
+        result = set()
+        visited = set()
+        stack = [group_id]
+        while stack:
             group_id = stack.pop()
-            result = session.query(Acl_rules).\
-                filter(Acl_rules.acl_snowflake == str(target_id),
-                       Acl_rules.acl_group_id == group_id).one_or_none()
-
-            if result is None:
-                groups = session.query(Acl_groups).\
-                    filter(Acl_groups.parent_id == group_id).all()
-                for group in groups:
-                    stack.append(group.id)
-                if stack == []:
-                    return None
-            else:
-                return result
+            if group_id in visited:
+                continue
+            visited.add(group_id)
+            result |= targets.get(group_id, set())
+            stack += children.get(group_id, [])
+        return result
 
-    def get_role_perms(self, role, target_id):
-        role_exceptions = session.query(Acl_role_binding).\
-            filter(Acl_role_binding.role_id == str(role.id)).all()
+    def bind(self, table, subject, binding):
+        for target in self.group_targets.get(binding.acl_group_id, ()):
+            table.setdefault((subject, target), binding.perms)
 
-        role_exceptions += session.query(Acl_role_binding).\
-            filter(Acl_role_binding.role_id == None,  # noqa
-                   Acl_role_binding.role_name == role.name).all()
 
-        for exception in role_exceptions:
-            result = self.find_target_exception(exception.acl_group_id,
-                                                target_id)
-            if result is not None:
-                return exception.perms
+class AclRepository(BaseRepository):
+    # Acl_permissions shared by all instances, loaded on first use
+    permissions = None
+
+    def get_permissions(self):
+        if AclRepository.permissions is None:
+            AclRepository.permissions = Acl_permissions(
+                session.query(Acl_groups).all(),
+                session.query(Acl_rules).all(),
+                session.query(Acl_role_binding).order_by(Acl_role_binding.id).all(),
+                session.query(Acl_user_binding).order_by(Acl_user_binding.id).all())
+        return AclRepository.permissions
+
+    def invalidate(self):
+        """Drops cached permissions, they are reloaded on the next lookup"""
+        AclRepository.permissions = None
 
-        return None
+    def find_user_exception(self, member_id, target_id):
+        return self.get_permissions().users.get((str(member_id), str(target_id)))
+
+    def get_role_perms(self, role, target_id):
+        permissions = self.get_permissions()
+        perms = permissions.role_ids.get((str(role.id), str(target_id)))
+        if perms is None:
+            perms = permissions.role_names.get((role.name, str(target_id)))
+        return perms
 
     def add_group(self, name, parent_id=None):
         group = Acl_groups(name=name, parent_id=parent_id)
         session.add(group)
         session.commit()
+        self.invalidate()
 
     def edit_group(self, id, name, parent_id=None):
         group = Acl_groups(id=id, name=name, parent_id=parent_id)
         session.merge(group)
         session.commit()
+        self.invalidate()
 
     def del_group(self, id):
         session.query(Acl_groups).filter(Acl_groups.id == id).delete()
+        session.commit()
+        self.invalidate()
         # TODO delete children etcu
 
     def list_group(self, id=None):
@@ -80,15 +112,19 @@ class AclRepository(BaseRepository):
                          acl_snowflake=acl_snowflake)
         session.add(rule)
         session.commit()
+        self.invalidate()
 
     def edit_rule(self, id, acl_group_id, acl_snowflake):
         rule = Acl_rules(id=id, acl_group_id=acl_group_id,
                          acl_snowflake=acl_snowflake)
         session.merge(rule)
         session.commit()
+        self.invalidate()
 
     def del_rule(self, id):
         session.query(Acl_rules).filter(Acl_rules.id == id).delete()
+        session.commit()
+        self.invalidate()
 
     def list_rule(self, id=None):
         query = session.query(Acl_rules)
@@ -112,6 +148,7 @@ class AclRepository(BaseRepository):
                                 perms=perms)
         session.add(rule)
         session.commit()
+        self.invalidate()
 
     def edit_role(self, id, acl_group_id, role_id_name, perms):
         try:
@@ -126,10 +163,13 @@ class AclRepository(BaseRepository):
                                 perms=perms)
         session.merge(rule)
         session.commit()
+        self.invalidate()
 
     def del_role(self, id):
         session.query(Acl_role_binding).\
                 filter(Acl_role_binding.id == id).delete()
+        session.commit()
+        self.invalidate()
 
     def list_role(self, id=None):
         query = session.query(Acl_role_binding)
@@ -144,16 +184,20 @@ class AclRepository(BaseRepository):
                                 user_id=user_id, perms=perms)
         session.add(rule)
         session.commit()
+        self.invalidate()
 
     def edit_user(self, id, acl_group_id, user_id, perms):
-        rule = Acl_role_binding(id=id, acl_group_id=acl_group_id,
+        rule = Acl_user_binding(id=id, acl_group_id=acl_group_id,
                                 user_id=user_id, perms=perms)
         session.merge(rule)
         session.commit()
+        self.invalidate()
 
     def del_user(self, id):
         session.query(Acl_user_binding).\
                 filter(Acl_user_binding.id == id).delete()
+        session.commit()
+        self.invalidate()
 
     def list_user(self, id=None):
         query = session.query(Acl_user_binding)
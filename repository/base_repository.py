@@ -1,9 +1,40 @@
+import inspect
+
 from config.app_config import Config
 from config import messages
+from repository.db_stats import measured
 
 
 class BaseRepository:
 
+    def __init_subclass__(cls, **kwargs):
+        # queries of public methods are counted for the repository in DB stats
+        super().__init_subclass__(**kwargs)
+        for name, attr in list(vars(cls).items()):
+            if inspect.isfunction(attr) and not name.startswith('_'):
+                setattr(cls, name, measured(attr, cls.__name__))
+
     def __init__(self):
         self.config = Config
         self.messages = messages.Messages
+        self.aio = AsyncRepository(self)
+
+
+class AsyncRepository:
+    """Awaitable variant of repository methods.
+    `await repo.aio.method(*args)` runs `repo.method(*args)` in the database executor,
+    so the query doesn't block the event loop.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def __getattr__(self, name):
+        method = getattr(self.repository, name)
+
+        async def call(*args, **kwargs):
+            # repository.database imports this module
+            from repository.database import run
+            return await run(method, *args, **kwargs)
+
+        return call
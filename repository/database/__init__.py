@@ -1,15 +1,57 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from sqlalchemy.ext.declarative import declarative_base
 from repository.base_repository import BaseRepository
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from repository.db_stats import MeasuredQueuePool, count_query
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Query, Session, scoped_session
 
 
 class Database(BaseRepository):
     def __init__(self):
         super().__init__()
         self.base = declarative_base()
-        self.db = create_engine(self.config.db_string)
+        self.db = create_engine(
+            self.config.db_string,
+            poolclass=MeasuredQueuePool,
+            pool_size=self.config.db_pool_size,
+            max_overflow=self.config.db_max_overflow,
+            pool_timeout=self.config.db_pool_timeout,
+            pool_recycle=self.config.db_pool_recycle,
+            pool_pre_ping=self.config.db_pool_pre_ping,
+        )
+        event.listen(self.db, "before_cursor_execute", count_query)
+        self.executor = ThreadPoolExecutor(max_workers=self.config.db_workers)
+
+
+def create_session():
+    # Sessions of executor threads are removed after every call,
+    # objects returned from them have to stay loaded after commit.
+    in_executor = threading.current_thread() is not threading.main_thread()
+    return Session(bind=database.db, expire_on_commit=not in_executor)
+
+
+def call_in_session(func, *args, **kwargs):
+    try:
+        result = func(*args, **kwargs)
+        if isinstance(result, Query):
+            result = result.all()
+        return result
+    finally:
+        session.remove()
+
+
+async def run(func, *args, **kwargs):
+    """Runs blocking DB function in executor thread with its own session.
+    Returned queries are loaded to lists."""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(database.executor,
+                                      functools.partial(call_in_session, func, *args, **kwargs))
 
 
 database = Database()
-session = sessionmaker(database.db)()
+# thread local session, the main thread keeps using one session as before
+session = scoped_session(create_session)
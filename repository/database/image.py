@@ -1,7 +1,19 @@
 # stolen from rubbergoddess
-from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy import Column, BigInteger, DateTime
 from repository.database import database
 
+WORD_MASK = (1 << 64) - 1
+
+
+def to_signed(word: int):
+    """Reinterpret unsigned 64-bit word as signed for BIGINT column"""
+    return word - (1 << 64) if word >= 1 << 63 else word
+
+
+def hash_to_columns(dhash: int):
+    """Split 128-bit dhash into (high, low) values for BIGINT columns"""
+    return to_signed(dhash >> 64), to_signed(dhash & WORD_MASK)
+
 
 class Image(database.base):
     __tablename__ = "images"
@@ -10,4 +22,17 @@ class Image(database.base):
     message_id = Column(BigInteger)
     channel_id = Column(BigInteger)
     timestamp = Column(DateTime)
-    dhash = Column(String)
+    dhash_high = Column(BigInteger)
+    dhash_low = Column(BigInteger)
+
+    @property
+    def dhash(self):
+        return ((self.dhash_high & WORD_MASK) << 64) | (self.dhash_low & WORD_MASK)
+
+
+class ImageScan(database.base):
+    """Last message processed by `scan history` in channel"""
+    __tablename__ = "images_scan"
+
+    channel_id = Column(BigInteger, primary_key=True)
+    message_id = Column(BigInteger)
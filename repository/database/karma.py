@@ -6,9 +6,9 @@ class Karma(database.base):
     __tablename__ = 'bot_karma'
 
     member_ID = Column(String, primary_key=True)
-    karma = Column(Integer, default=0)
-    positive = Column(Integer, default=0)
-    negative = Column(Integer, default=0)
+    karma = Column(Integer, default=0, index=True)
+    positive = Column(Integer, default=0, index=True)
+    negative = Column(Integer, default=0, index=True)
 
 
 class Karma_emoji(database.base):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, Date, PrimaryKeyConstraint, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, Date, PrimaryKeyConstraint, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from repository.database import database
 
@@ -9,12 +9,18 @@ class Review(database.base):
     id = Column(Integer, primary_key=True)
     member_ID = Column(String)
     anonym = Column(Boolean, default=True)
-    subject = Column(String, ForeignKey("bot_subjects.shortcut", ondelete="CASCADE"))
+    subject = Column(String, ForeignKey("bot_subjects.shortcut", ondelete="CASCADE"), index=True)
     tier = Column(Integer, default=0)
     text_review = Column(String, default=None)
     date = Column(Date)
+    # number of 👍 and 👎 in relevance, maintained by ReviewRepository
+    upvotes = Column(Integer, default=0, server_default="0", nullable=False)
+    downvotes = Column(Integer, default=0, server_default="0", nullable=False)
     relevance = relationship("ReviewRelevance")
 
+    # reviews of subject in relevance order
+    __table_args__ = (Index("ix_bot_review_subject_upvotes", subject, upvotes.desc(), id),)
+
 
 class ReviewRelevance(database.base):
     __tablename__ = "bot_review_relevance"
@@ -38,9 +44,50 @@ class Subject_details(database.base):
     shortcut = Column(String, primary_key=True)
     name = Column(String)
     credits = Column(Integer)
-    semester = Column(String)
     end = Column(String)
     card = Column(String)
-    year = Column(String)
-    type = Column(String)
-    degree = Column(String)
+    semesters = relationship(
+        "Subject_semester", cascade="all, delete-orphan", order_by="Subject_semester.semester"
+    )
+    types = relationship("Subject_type", cascade="all, delete-orphan", order_by="Subject_type.type")
+    years = relationship("Subject_year", cascade="all, delete-orphan", order_by="Subject_year.year")
+    degrees = relationship("Subject_degree", cascade="all, delete-orphan", order_by="Subject_degree.degree")
+
+    # subjects are looked up case insensitive
+    __table_args__ = (Index("ix_bot_subjects_details_shortcut_lower", func.lower(shortcut)),)
+
+
+class Subject_semester(database.base):
+    __tablename__ = "bot_subjects_semesters"
+
+    shortcut = Column(
+        String, ForeignKey("bot_subjects_details.shortcut", ondelete="CASCADE"), primary_key=True
+    )
+    semester = Column(String, primary_key=True, index=True)
+
+
+class Subject_type(database.base):
+    __tablename__ = "bot_subjects_types"
+
+    shortcut = Column(
+        String, ForeignKey("bot_subjects_details.shortcut", ondelete="CASCADE"), primary_key=True
+    )
+    type = Column(String, primary_key=True, index=True)
+
+
+class Subject_year(database.base):
+    __tablename__ = "bot_subjects_years"
+
+    shortcut = Column(
+        String, ForeignKey("bot_subjects_details.shortcut", ondelete="CASCADE"), primary_key=True
+    )
+    year = Column(String, primary_key=True, index=True)
+
+
+class Subject_degree(database.base):
+    __tablename__ = "bot_subjects_degrees"
+
+    shortcut = Column(
+        String, ForeignKey("bot_subjects_details.shortcut", ondelete="CASCADE"), primary_key=True
+    )
+    degree = Column(String, primary_key=True, index=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, DateTime, Integer, String, JSON
+from repository.database import database
+
+
+class Scheduled_job(database.base):
+    __tablename__ = 'bot_scheduled_jobs'
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String)
+    run_at = Column(DateTime, index=True)
+    payload = Column(JSON)
@@ -1,10 +1,13 @@
 import re
 
+from sqlalchemy import inspect, text
+
 from repository.database import database, session
 from repository.database.karma import Karma, Karma_emoji
-from repository.database.review import (Review, ReviewRelevance, Subject, Subject_details)
+from repository.database.review import Review, Subject_details
 from repository.database.verification import Permit, Valid_person
 from repository.database.image import Image
+from repository.database.scheduler import Scheduled_job  # noqa: F401
 from repository.review_repo import ReviewRepository
 
 from config.app_config import Config
@@ -12,11 +15,98 @@ from config.app_config import Config
 
 def init_db(commit: bool = True):
     database.base.metadata.create_all(database.db)
+    migrate_db()
 
     if commit:
         session.commit()
 
 
+def get_columns(table: str):
+    return [column["name"] for column in inspect(database.db).get_columns(table)]
+
+
+def migrate_db():
+    """Applies changes of existing tables, every migration has to be idempotent."""
+    migrate_image_hashes()
+    migrate_review_votes()
+    migrate_subject_details()
+    create_missing_indexes()
+
+
+def create_missing_indexes():
+    """create_all creates indexes only together with new tables"""
+    for table in database.base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(database.db, checkfirst=True)
+
+
+def migrate_image_hashes():
+    """Converts hex string `images.dhash` to two BIGINT columns"""
+    columns = get_columns(Image.__tablename__)
+    if "dhash" not in columns:
+        return
+
+    print("Migrating image hashes")
+    if "dhash_high" not in columns:
+        session.execute(text("ALTER TABLE images ADD COLUMN dhash_high BIGINT, ADD COLUMN dhash_low BIGINT"))
+
+    # '0x...' -> 32 hex digits -> two signed 64-bit words
+    session.execute(text(
+        "UPDATE images SET "
+        "dhash_high = ('x' || substr(lpad(substr(dhash, 3), 32, '0'), 1, 16))::bit(64)::bigint, "
+        "dhash_low = ('x' || substr(lpad(substr(dhash, 3), 32, '0'), 17, 16))::bit(64)::bigint"
+    ))
+    session.execute(text("ALTER TABLE images DROP COLUMN dhash"))
+    session.commit()
+
+
+def migrate_review_votes():
+    """Adds `bot_review` vote counters and fills them from `bot_review_relevance`"""
+    if "upvotes" in get_columns(Review.__tablename__):
+        return
+
+    print("Migrating review votes")
+    session.execute(text(
+        "ALTER TABLE bot_review "
+        "ADD COLUMN upvotes INTEGER NOT NULL DEFAULT 0, "
+        "ADD COLUMN downvotes INTEGER NOT NULL DEFAULT 0"
+    ))
+    session.execute(text(
+        "UPDATE bot_review SET upvotes = votes.up, downvotes = votes.down "
+        "FROM (SELECT review, "
+        "count(*) FILTER (WHERE vote) AS up, count(*) FILTER (WHERE NOT vote) AS down "
+        "FROM bot_review_relevance GROUP BY review) AS votes "
+        "WHERE votes.review = bot_review.id"
+    ))
+    session.commit()
+
+
+def migrate_subject_details():
+    """Moves comma separated `bot_subjects_details` semester, type, year and degree to link tables"""
+    columns = get_columns(Subject_details.__tablename__)
+    if "year" not in columns:
+        return
+
+    print("Migrating subject details")
+    # link tables are already created by create_all
+    for column in ("semester", "type", "year", "degree"):
+        if column not in columns:
+            continue
+        session.execute(text(
+            f"INSERT INTO bot_subjects_{column}s (shortcut, {column}) "
+            f"SELECT DISTINCT shortcut, trim(value) FROM bot_subjects_details, "
+            f"unnest(string_to_array({column}, ',')) AS value "
+            f"WHERE trim(value) <> '' "
+            f"ON CONFLICT DO NOTHING"
+        ))
+    session.execute(text(
+        "ALTER TABLE bot_subjects_details "
+        "DROP COLUMN IF EXISTS semester, DROP COLUMN IF EXISTS type, "
+        "DROP COLUMN IF EXISTS year, DROP COLUMN IF EXISTS degree"
+    ))
+    session.commit()
+
+
 def load_dump(filename: str):
     init_db(False)
 
@@ -0,0 +1,89 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Query
+from sqlalchemy.pool import QueuePool
+
+
+class DatabaseStats:
+    """Connection pool usage and number of queries of every repository"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = time.time()
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.timeouts = 0
+            self.queries = {}
+
+    def add_checkout(self, wait, timeout=False):
+        with self.lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def add_query(self, repository=None):
+        name = repository or getattr(caller, 'name', None) or 'other'
+        with self.lock:
+            self.queries[name] = self.queries.get(name, 0) + 1
+
+
+# name of the repository which runs queries in the current thread
+caller = threading.local()
+
+
+@contextmanager
+def repository_call(name):
+    """Queries run inside are counted for repository `name`, the innermost call wins"""
+    previous = getattr(caller, 'name', None)
+    caller.name = name
+    try:
+        yield
+    finally:
+        caller.name = previous
+
+
+def measured(method, name):
+    """Wraps repository method, so its queries are counted for `name`.
+    Returned queries run later outside of the method, they carry the name in execution options.
+    """
+    @functools.wraps(method)
+    def call(*args, **kwargs):
+        with repository_call(name):
+            result = method(*args, **kwargs)
+        if isinstance(result, Query):
+            result = result.execution_options(repository=name)
+        return result
+    return call
+
+
+stats = DatabaseStats()
+
+
+class MeasuredQueuePool(QueuePool):
+    """QueuePool which records time spent waiting for a free connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            stats.add_checkout(time.perf_counter() - start, timeout=True)
+            raise
+        stats.add_checkout(time.perf_counter() - start)
+        return connection
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    stats.add_query(context.execution_options.get('repository') if context is not None else None)
@@ -1,32 +1,108 @@
 # stolen from rubbergoddess
 import datetime
 
+from sqlalchemy import String, cast, func
+from sqlalchemy.dialects.postgresql import BIT
+
 from repository.base_repository import BaseRepository
 from repository.database import session
-from repository.database.image import Image
+from repository.database.image import Image, ImageScan, hash_to_columns
+
+
+def bit_count(expression):
+    """Number of set bits in BIGINT expression (bit_count() needs PostgreSQL 14)"""
+    bits = cast(cast(expression, BIT(64)), String)
+    return func.length(func.replace(bits, "0", ""))
 
 
 class ImageRepository(BaseRepository):
-    def add_image(self, channel_id: int, message_id: int, attachment_id: int, dhash: str):
-        """Add new image hash"""
+    def add_image(self, channel_id: int, message_id: int, attachment_id: int, dhash: int):
+        """Add new image hash, returns the new row or None if the message is already indexed"""
 
         if self.getByMessage(message_id) is not None:
             # message already indexed
-            return
-
-        session.add(
-            Image(
-                channel_id=channel_id,
-                message_id=message_id,
-                attachment_id=attachment_id,
-                dhash=dhash,
-                timestamp=datetime.datetime.now().replace(microsecond=0),
-            )
+            return None
+
+        dhash_high, dhash_low = hash_to_columns(dhash)
+        image = Image(
+            channel_id=channel_id,
+            message_id=message_id,
+            attachment_id=attachment_id,
+            dhash_high=dhash_high,
+            dhash_low=dhash_low,
+            timestamp=datetime.datetime.now().replace(microsecond=0),
         )
+        session.add(image)
+        session.commit()
+        return image
+
+    def add_images(self, images: list):
+        """Bulk insert image hashes, `images` is a list of dicts with add_image arguments.
+        Messages that are already indexed are skipped, returns list of new rows.
+        """
+        message_ids = [image["message_id"] for image in images]
+        indexed = session.query(Image.message_id).filter(Image.message_id.in_(message_ids))
+        indexed = {message_id for message_id, in indexed}
+
+        timestamp = datetime.datetime.now().replace(microsecond=0)
+        new_images = []
+        for image in images:
+            if image["message_id"] in indexed:
+                continue
+            indexed.add(image["message_id"])
+            dhash_high, dhash_low = hash_to_columns(image["dhash"])
+            new_images.append(
+                Image(
+                    channel_id=image["channel_id"],
+                    message_id=image["message_id"],
+                    attachment_id=image["attachment_id"],
+                    dhash_high=dhash_high,
+                    dhash_low=dhash_low,
+                    timestamp=timestamp,
+                )
+            )
+
+        session.bulk_save_objects(new_images)
         session.commit()
+        return new_images
+
+    def get_scan_checkpoint(self, channel_id: int):
+        """Returns id of last message processed by scan in channel or None"""
+        scan = session.query(ImageScan).filter(ImageScan.channel_id == channel_id).one_or_none()
+        return scan.message_id if scan else None
+
+    def set_scan_checkpoint(self, channel_id: int, message_id: int):
+        session.merge(ImageScan(channel_id=channel_id, message_id=message_id))
+        session.commit()
+
+    def delete_scan_checkpoint(self, channel_id: int):
+        session.query(ImageScan).filter(ImageScan.channel_id == channel_id).delete()
+        session.commit()
+
+    def getHash(self, dhash: int):
+        dhash_high, dhash_low = hash_to_columns(dhash)
+        return session.query(Image).filter(Image.dhash_high == dhash_high, Image.dhash_low == dhash_low).all()
+
+    def getSimilar(self, dhash: int, max_distance: int):
+        """Get images within `max_distance` bits from `dhash`, closest first.
+        The distance is computed by the database, returns (Image, distance) pairs.
+        """
+        dhash_high, dhash_low = hash_to_columns(dhash)
+        distance = (
+            bit_count(Image.dhash_high.op("#")(dhash_high)) + bit_count(Image.dhash_low.op("#")(dhash_low))
+        ).label("distance")
+        return (
+            session.query(Image, distance)
+            .filter(distance <= max_distance)
+            .order_by(distance)
+        )
 
-    def getHash(self, dhash: str):
-        return session.query(Image).filter(Image.dhash == dhash).all()
+    def getClosest(self, dhash: int, max_distance: int, skip_message_id=None):
+        """Get the closest (Image, distance) within `max_distance` bits outside of `skip_message_id`"""
+        similar = self.getSimilar(dhash, max_distance)
+        if skip_message_id is not None:
+            similar = similar.filter(Image.message_id != skip_message_id)
+        return similar.first()
 
     def getByMessage(self, message_id: int):
         return session.query(Image).filter(Image.message_id == message_id).one_or_none()
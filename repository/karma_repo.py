@@ -1,5 +1,10 @@
+import threading
+import time
+
 import utils
-from sqlalchemy import func
+from sortedcontainers import SortedList
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
 from repository.base_repository import BaseRepository
 from repository.database import session
 from repository.database.karma import Karma, Karma_emoji
@@ -18,10 +23,59 @@ class Karma_data():
         self.negative = negative
 
 
+class Karma_ranks():
+    """Sorted values of every karma column for O(log n) position lookups and updates"""
+    columns = ('karma', 'positive', 'negative')
+
+    def __init__(self, rows):
+        self.members = {}
+        for row in rows:
+            self.members[row.member_ID] = tuple(getattr(row, column) or 0 for column in self.columns)
+        self.values = [SortedList(values[i] for values in self.members.values())
+                       for i in range(len(self.columns))]
+
+    def update(self, member_id, karma, positive, negative):
+        old = self.members.get(member_id)
+        new = (karma, positive, negative)
+        for i, values in enumerate(self.values):
+            if old is not None:
+                values.remove(old[i])
+            values.add(new[i])
+        self.members[member_id] = new
+
+    def get_values(self, member_id):
+        return self.members.get(member_id, (0, 0, 0))
+
+    def get_position(self, column, value):
+        """Returns 1 + number of members with higher value in column"""
+        values = self.values[self.columns.index(column)]
+        return len(values) - values.bisect_right(value) + 1
+
+
 class KarmaRepository(BaseRepository):
+    # emoji_ID -> value of every voted emoji, shared by all instances
+    emoji_values = None
+    # member_ID -> {column: delta} of karma changes not written to DB yet
+    karma_buffer = {}
+    # Karma_ranks of all members, loaded on first use
+    karma_ranks = None
+    # str(order attribute) -> (load time, ordered rows) of leaderboards
+    leaderboard_cache = {}
+    # methods are called from database executor threads as well,
+    # `lock` guards the buffer and ranks, `write_lock` orders karma writes
+    lock = threading.RLock()
+    write_lock = threading.RLock()
 
     def __init__(self):
         super().__init__()
+        if KarmaRepository.emoji_values is None:
+            self.load_emoji_values()
+
+    def load_emoji_values(self):
+        """Loads emoji values from DB into cache"""
+        KarmaRepository.emoji_values = {
+            emoji.emoji_ID: emoji.value for emoji in session.query(Karma_emoji)
+        }
 
     def get_ids_of_emojis_valued(self, val):
         """Returns a list of ids of emojis with specified value"""
@@ -41,10 +95,7 @@ class KarmaRepository(BaseRepository):
     def emoji_value_raw(self, emoji_id):
         """Returns the value of an emoji.
         If the emoji has not been voted for, returns None."""
-        emoji = session.query(Karma_emoji).\
-            filter(Karma_emoji.emoji_ID == utils.str_emoji_id(emoji_id)).\
-            one_or_none()
-        return emoji.value if emoji else None
+        return KarmaRepository.emoji_values.get(utils.str_emoji_id(emoji_id))
 
     def set_emoji_value(self, emoji_id, value: int):
         emoji = Karma_emoji(emoji_ID=utils.str_emoji_id(emoji_id),
@@ -52,27 +103,86 @@ class KarmaRepository(BaseRepository):
         # Merge == 'insert on duplicate key update'
         session.merge(emoji)
         session.commit()
+        KarmaRepository.emoji_values[emoji.emoji_ID] = int(value)
 
     def remove_emoji(self, emoji_id):
+        emoji_id = utils.str_emoji_id(emoji_id)
         session.query(Karma_emoji).\
-            filter(Karma_emoji.emoji_ID == utils.str_emoji_id(emoji_id)).\
+            filter(Karma_emoji.emoji_ID == emoji_id).\
             delete()
         session.commit()
+        KarmaRepository.emoji_values.pop(emoji_id, None)
 
     def update_karma(self, member, giver, emoji_value, remove=False):
-        self.update_karma_get(member, emoji_value)
-        self.update_karma_give(giver, emoji_value, remove)
-
-        session.commit()
-
-    def update_karma_get(self, member, emoji_value):
-        members_karma = self.get_karma_object(member.id)
-        if members_karma is not None:
-            members_karma.karma += emoji_value
-        else:
-            session.add(Karma(member_ID=member.id, karma=emoji_value))
-
-    def update_karma_give(self, giver, emoji_value, remove):
+        """Buffers karma change, it's written to DB by flush_karma"""
+        self.buffer_karma(member.id, 'karma', emoji_value)
+        self.buffer_karma(giver.id, *self.get_giving_column(emoji_value, remove))
+
+        if len(KarmaRepository.karma_buffer) >= self.config.karma_flush_threshold:
+            self.flush_karma()
+
+    def buffer_karma(self, member_id, column, value):
+        with self.lock:
+            deltas = KarmaRepository.karma_buffer.setdefault(
+                str(member_id), {'karma': 0, 'positive': 0, 'negative': 0})
+            deltas[column] += value
+
+    def flush_karma(self):
+        """Writes all buffered karma changes to DB with a single upsert"""
+        with self.write_lock:
+            with self.lock:
+                buffer = KarmaRepository.karma_buffer
+                if not buffer:
+                    return
+                KarmaRepository.karma_buffer = {}
+
+            try:
+                rows = self.upsert_karma(buffer)
+                session.commit()
+            except Exception:
+                session.rollback()
+                # keep the changes for the next flush
+                for member_id, deltas in buffer.items():
+                    for column, value in deltas.items():
+                        self.buffer_karma(member_id, column, value)
+                raise
+            self.update_ranks(rows)
+
+    def get_ranks(self):
+        with self.lock:
+            if KarmaRepository.karma_ranks is None:
+                KarmaRepository.karma_ranks = Karma_ranks(session.query(Karma))
+            return KarmaRepository.karma_ranks
+
+    def update_ranks(self, rows):
+        """Updates ranks by rows with new values, only if they are already loaded"""
+        with self.lock:
+            if KarmaRepository.karma_ranks is None:
+                return
+            for row in rows:
+                KarmaRepository.karma_ranks.update(*row)
+
+    def upsert_karma(self, changes):
+        """Adds karma changes {member_ID: {column: delta}} to DB in one statement,
+        members without a row are inserted. Doesn't commit.
+        Returns new (member_ID, karma, positive, negative) rows.
+        """
+        rows = []
+        for member_id, deltas in changes.items():
+            row = {'member_ID': str(member_id), 'karma': 0, 'positive': 0, 'negative': 0}
+            row.update(deltas)
+            rows.append(row)
+
+        statement = insert(Karma.__table__).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Karma.member_ID],
+            set_={column: getattr(Karma, column) + getattr(statement.excluded, column)
+                  for column in ('karma', 'positive', 'negative')})
+        statement = statement.returning(Karma.member_ID, Karma.karma, Karma.positive, Karma.negative)
+        return session.execute(statement).fetchall()
+
+    def get_giving_column(self, emoji_value, remove):
+        """Returns giver's column changed by emoji and the change"""
         if emoji_value > 0:
             if remove:
                 column = 'negative'
@@ -87,14 +197,7 @@ class KarmaRepository(BaseRepository):
         if column == 'negative':
             emoji_value *= -1
 
-        givers_karma = self.get_karma_object(giver.id)
-        if givers_karma is not None:
-            setattr(givers_karma, column,
-                    getattr(givers_karma, column) + emoji_value)
-        else:
-            new_giver = Karma(member_ID=giver.id)
-            setattr(new_giver, column, emoji_value)
-            session.add(new_giver)
+        return column, emoji_value
 
     def karma_emoji(self, member_id, giver, emoji_id):
         emoji_value = int(self.emoji_value(str(emoji_id)))
@@ -106,55 +209,67 @@ class KarmaRepository(BaseRepository):
         if emoji_value:
             self.update_karma(member_id, giver, emoji_value * (-1), True)
 
-    def get_karma_object(self, member_id):
-        return session.query(Karma).\
-            filter(Karma.member_ID == str(member_id)).one_or_none()
-
     def get_karma_position(self, column, karma):
-        value = session.query(func.count(Karma.member_ID)).\
-            filter(getattr(Karma, column) > karma).one()
-        return value[0] + 1
+        return self.get_ranks().get_position(column, karma)
 
     def get_karma(self, member_id):
-        karma_object = self.get_karma_object(member_id)
-
-        if karma_object is None:
-            karma_object = Karma(karma=0, positive=0, negative=0)
+        self.flush_karma()
+        with self.lock:
+            karma_value, positive_value, negative_value = self.get_ranks().get_values(str(member_id))
 
-        order = self.get_karma_position("karma", karma_object.karma)
-        pos_order = self.get_karma_position("positive", karma_object.positive)
-        neg_order = self.get_karma_position("negative", karma_object.negative)
+            order = self.get_karma_position("karma", karma_value)
+            pos_order = self.get_karma_position("positive", positive_value)
+            neg_order = self.get_karma_position("negative", negative_value)
 
-        karma = Karma_row_data(karma_object.karma, order)
-        positive = Karma_row_data(karma_object.positive, pos_order)
-        negative = Karma_row_data(karma_object.negative, neg_order)
+        karma = Karma_row_data(karma_value, order)
+        positive = Karma_row_data(positive_value, pos_order)
+        negative = Karma_row_data(negative_value, neg_order)
 
         result = Karma_data(karma, positive, negative)
         return result
 
     def get_leaderboard(self, atribute, offset=0):
-        leaderboard = session.query(Karma).order_by(atribute).offset(offset).limit(10)
+        leaderboard = self.get_leaderboard_snapshot(atribute)
+        return leaderboard[offset:offset + 10]
+
+    def get_leaderboard_snapshot(self, atribute):
+        """Returns all rows ordered by `atribute`, reloaded after karma.leaderboard_cache_ttl seconds"""
+        key = str(atribute)
+        cached = KarmaRepository.leaderboard_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.config.karma_leaderboard_cache_ttl:
+            return cached[1]
+
+        self.flush_karma()
+        leaderboard = session.query(Karma.member_ID, Karma.karma, Karma.positive, Karma.negative).\
+            order_by(atribute).all()
+        KarmaRepository.leaderboard_cache[key] = (time.monotonic(), leaderboard)
         return leaderboard
 
     def get_leaderboard_max(self):
-        return session.query(Karma).count()
+        self.flush_karma()
+        return len(self.get_ranks().members)
 
     def transfer_karma(self, from_user, to_user):
-        from_user_karma = self.get_karma_object(from_user.id)
-        to_user_karma = self.get_karma_object(to_user.id)
-
-        log_karma = Karma_data(from_user_karma.karma, from_user_karma.positive, from_user_karma.negative)
-
-        # Move karma
-        self.update_karma_get(to_user, from_user_karma.karma)
-        self.update_karma_get(from_user, -from_user_karma.karma)
-
-        # Move positive and negative reactions
-        to_user_karma.positive += from_user_karma.positive
-        to_user_karma.negative += from_user_karma.negative
-
-        from_user_karma.positive = 0
-        from_user_karma.negative = 0
-
-        session.commit()
-        return log_karma
+        with self.write_lock:
+            self.flush_karma()
+
+            # Reset source row and get its previous values in one statement
+            old = session.query(Karma.member_ID, Karma.karma, Karma.positive, Karma.negative).\
+                filter(Karma.member_ID == str(from_user.id)).with_for_update().subquery()
+            statement = update(Karma.__table__).\
+                where(Karma.member_ID == old.c.member_ID).\
+                values(karma=0, positive=0, negative=0).\
+                returning(old.c.karma, old.c.positive, old.c.negative)
+            moved = session.execute(statement).first()
+            if moved is None:
+                session.rollback()
+                return Karma_data(0, 0, 0)
+
+            log_karma = Karma_data(*moved)
+            rows = self.upsert_karma({to_user.id: {'karma': log_karma.karma,
+                                                   'positive': log_karma.positive,
+                                                   'negative': log_karma.negative}})
+
+            session.commit()
+            self.update_ranks(rows + [(str(from_user.id), 0, 0, 0)])
+            return log_karma
@@ -1,28 +1,144 @@
 import datetime
-from sqlalchemy import func, desc, asc
+import threading
+from collections import namedtuple
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.dialects.postgresql import insert
 
 from repository.base_repository import BaseRepository
 from repository.database import session
-from repository.database.review import Review, ReviewRelevance, Subject, Subject_details
+from repository.database.review import (Review, ReviewRelevance, Subject, Subject_details,
+                                        Subject_degree, Subject_semester, Subject_type, Subject_year)
+
+
+Tierboard_row = namedtuple("Tierboard_row", ["shortcut", "avg_tier"])
+
+
+# link tables of subject details, in order of tierboard filters
+subject_links = {
+    "degree": Subject_degree,
+    "type": Subject_type,
+    "semester": Subject_semester,
+    "year": Subject_year,
+}
+
+
+class Tierboard():
+    """Tier sum and count of reviews of every subject with filter values of its details.
+    Sorted boards are cached per filter and dropped when some tier changes.
+    """
+
+    def __init__(self, tiers, links):
+        # shortcut -> [sum of tiers, number of tiers]
+        self.tiers = {subject: [tier_sum, count] for subject, tier_sum, count in tiers}
+        # shortcut -> filter -> set of values
+        self.details = {}
+        for name, shortcut, value in links:
+            self.details.setdefault(shortcut.lower(), {}).setdefault(name, set()).add(value)
+        # filter values -> rows ordered by average tier
+        self.boards = {}
+
+    def update(self, subject, tier_change, count_change):
+        stats = self.tiers.setdefault(subject, [0, 0])
+        stats[0] += tier_change
+        stats[1] += count_change
+        if stats[1] == 0:
+            del self.tiers[subject]
+        self.boards.clear()
+
+    def matches(self, subject, values):
+        """Subject has every given filter value, empty values don't filter"""
+        details = self.details.get(subject)
+        if details is None:
+            return False
+        for name, value in zip(subject_links, values):
+            if value and value not in details.get(name, ()):
+                return False
+        return True
+
+    def get_board(self, values):
+        board = self.boards.get(values)
+        if board is None:
+            board = sorted(
+                (Tierboard_row(subject, tier_sum / count) for subject, (tier_sum, count) in self.tiers.items()
+                 if self.matches(subject, values)),
+                key=lambda row: (row.avg_tier, row.shortcut))
+            self.boards[values] = board
+        return board
 
 
 class ReviewRepository(BaseRepository):
+    # subject -> number of its reviews, shared by all instances
+    reviews_count = {}
+    # Tierboard of all subjects, loaded on first use
+    tierboard = None
+    # caches are shared by the main thread and DB executor threads, `lock` guards them.
+    # Generations are raised by every invalidation, value loaded meanwhile is not cached.
+    lock = threading.Lock()
+    reviews_count_generation = 0
+    tierboard_generation = 0
+
     def __init__(self):
         super().__init__()
 
     def get_subject_reviews(self, subject):
+        """Reviews of subject ordered by relevance (number of upvotes)"""
         return (
-            session.query(
-                Review,
-                func.avg(Review.tier).label("avg_tier"),
-                func.count(Review.relevance).filter(ReviewRelevance.vote).label("total"),
-            )
+            session.query(Review)
             .filter(Review.subject == subject)
-            .outerjoin(Review.relevance)
-            .group_by(Review)
-            .order_by(desc("total"))
+            .order_by(Review.upvotes.desc(), Review.id)
+        )
+
+    def get_subject_review(self, subject, page):
+        """Returns review on `page` (from 1) of subject reviews ordered by relevance"""
+        return self.get_subject_reviews(subject).offset(page - 1).limit(1).first()
+
+    def get_adjacent_review(self, review, forward: bool = True):
+        """Returns review following (or preceding) `review` in relevance order"""
+        if forward:
+            after = or_(
+                Review.upvotes < review.upvotes,
+                and_(Review.upvotes == review.upvotes, Review.id > review.id),
+            )
+            order = (Review.upvotes.desc(), Review.id)
+        else:
+            after = or_(
+                Review.upvotes > review.upvotes,
+                and_(Review.upvotes == review.upvotes, Review.id < review.id),
+            )
+            order = (Review.upvotes, Review.id.desc())
+        return (
+            session.query(Review)
+            .filter(Review.subject == review.subject, after)
+            .order_by(*order)
+            .first()
         )
 
+    def get_subject_reviews_count(self, subject):
+        with self.lock:
+            count = ReviewRepository.reviews_count.get(subject)
+            generation = ReviewRepository.reviews_count_generation
+        if count is None:
+            count = session.query(Review).filter(Review.subject == subject).count()
+            with self.lock:
+                if ReviewRepository.reviews_count_generation == generation:
+                    ReviewRepository.reviews_count[subject] = count
+        return count
+
+    def invalidate_reviews_count(self, subject=None):
+        """Drops cached count of subject reviews, or of all subjects"""
+        with self.lock:
+            ReviewRepository.reviews_count_generation += 1
+            if subject is None:
+                ReviewRepository.reviews_count.clear()
+            else:
+                ReviewRepository.reviews_count.pop(subject, None)
+
+    def get_subject_tier_avg(self, subject):
+        return session.query(func.avg(Review.tier)).filter(Review.subject == subject).scalar()
+
+    def get_review(self, id):
+        return session.query(Review).filter(Review.id == id).one_or_none()
+
     def get_review_by_author_subject(self, author_id, subject):
         return (
             session.query(Review)
@@ -31,9 +147,12 @@ class ReviewRepository(BaseRepository):
         )
 
     def update_review(self, id, tier, anonym: bool, text):
+        old = session.query(Review.subject, Review.tier).filter(Review.id == id).one()
         review = Review(id=id, tier=tier, anonym=anonym, text_review=text, date=datetime.date.today())
         session.merge(review)
         session.commit()
+        self.update_tierboard(old.subject, old.tier, -1)
+        self.update_tierboard(old.subject, tier, 1)
 
     def add_review(self, author, subject, tier, anonym: bool, text):
         try:
@@ -50,16 +169,51 @@ class ReviewRepository(BaseRepository):
         except Exception:
             session.rollback()
             raise
+        self.invalidate_reviews_count(subject)
+        self.update_tierboard(subject, tier, 1)
 
     def remove(self, id):
-        session.query(Review).filter(Review.id == id).delete()
+        statement = delete(Review).where(Review.id == id).returning(Review.subject, Review.tier)
+        removed = session.execute(statement).first()
+        session.commit()
+        if removed is not None:
+            self.invalidate_reviews_count(removed.subject)
+            self.update_tierboard(removed.subject, removed.tier, -1)
 
-    def get_votes_count(self, review_id, vote: bool):
-        return (
-            session.query(ReviewRelevance)
-            .filter(ReviewRelevance.review == review_id, ReviewRelevance.vote == vote)
-            .count()
-        )
+    def get_tierboard_data(self):
+        with self.lock:
+            tierboard = ReviewRepository.tierboard
+            generation = ReviewRepository.tierboard_generation
+        if tierboard is None:
+            tiers = (
+                session.query(Review.subject, func.sum(Review.tier), func.count(Review.tier))
+                .group_by(Review.subject)
+                .all()
+            )
+            links = [
+                (name, shortcut, value)
+                for name, link in subject_links.items()
+                for shortcut, value in session.query(link.shortcut, getattr(link, name))
+            ]
+            tierboard = Tierboard(tiers, links)
+            with self.lock:
+                if ReviewRepository.tierboard_generation == generation:
+                    ReviewRepository.tierboard = tierboard
+        return tierboard
+
+    def update_tierboard(self, subject, tier, count_change):
+        """Adds (count_change 1) or removes (-1) tier of subject, if the tierboard is loaded"""
+        with self.lock:
+            ReviewRepository.tierboard_generation += 1
+            if ReviewRepository.tierboard is None or tier is None:
+                return
+            ReviewRepository.tierboard.update(subject, tier * count_change, count_change)
+
+    def invalidate_tierboard(self):
+        """Subject details changed, tierboard is loaded again on next use"""
+        with self.lock:
+            ReviewRepository.tierboard_generation += 1
+            ReviewRepository.tierboard = None
 
     def get_vote_by_author(self, review_id, author):
         return (
@@ -68,15 +222,49 @@ class ReviewRepository(BaseRepository):
             .first()
         )
 
+    def update_votes_count(self, review_id, vote: bool, change: int):
+        column = Review.upvotes if vote else Review.downvotes
+        session.query(Review).filter(Review.id == review_id).update(
+            {column: column + change}, synchronize_session=False
+        )
+
     def add_vote(self, review_id, vote: bool, author):
-        relevance = ReviewRelevance(member_ID=author, vote=vote, review=review_id)
-        session.merge(relevance)
-        session.commit()
+        """Add or change vote of author, vote counters of review are updated in the same transaction"""
+        try:
+            relevance = (
+                session.query(ReviewRelevance)
+                .filter(ReviewRelevance.review == review_id, ReviewRelevance.member_ID == author)
+                .with_for_update()
+                .one_or_none()
+            )
+            if relevance is not None and relevance.vote == vote:
+                session.rollback()
+                return
+            if relevance is None:
+                session.add(ReviewRelevance(member_ID=author, vote=vote, review=review_id))
+            else:
+                relevance.vote = vote
+                self.update_votes_count(review_id, not vote, -1)
+            self.update_votes_count(review_id, vote, 1)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
 
     def remove_vote(self, review_id, author):
-        session.query(ReviewRelevance).filter(
-            ReviewRelevance.review == review_id, ReviewRelevance.member_ID == author
-        ).delete()
+        try:
+            statement = (
+                delete(ReviewRelevance)
+                .where(ReviewRelevance.review == review_id, ReviewRelevance.member_ID == author)
+                .returning(ReviewRelevance.vote)
+            )
+            removed = session.execute(statement).first()
+            if removed is not None:
+                self.update_votes_count(review_id, removed.vote, -1)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
 
     def get_subject(self, shortcut):
         return session.query(Subject).filter(Subject.shortcut == shortcut)
@@ -94,54 +282,54 @@ class ReviewRepository(BaseRepository):
         session.commit()
 
     def get_tierboard(self, type, sem, degree, year, offset=0):
-        subquery = (
-            session.query(Subject.reviews, Subject_details, func.avg(Review.tier).label("avg_tier"))
-            .outerjoin(Subject.reviews)
-            .group_by(Subject)
-            .outerjoin(Subject_details, func.lower(Subject_details.shortcut) == Subject.shortcut)
-            .group_by(Subject_details.shortcut)
-            .group_by(Review.subject)
-            .filter(Subject_details.degree.contains(degree))
-            .filter(Subject_details.type.contains(type))
-            .filter(Subject_details.semester.contains(sem))
-            .filter(Subject_details.year.contains(year))
-            .subquery()
-        )
-        return (
-            session.query(subquery.c.shortcut, subquery.c.avg_tier)
-            .filter(subquery.c.avg_tier != None)
-            .order_by(asc("avg_tier"))
-            .offset(offset)
-            .limit(10)
-            .all()
-        )
+        """Returns 10 subjects matching filters ordered by average tier of their reviews"""
+        tierboard = self.get_tierboard_data()
+        with self.lock:
+            board = tierboard.get_board((degree, type, sem, year))
+        return board[offset:offset + 10]
 
-    def set_subject_details(self, shortcut, name, credits, semester, end, card, type, for_year, degree):
-        subject = Subject_details(
-            shortcut=shortcut,
-            name=name,
-            credits=credits,
-            semester=semester,
-            end=end,
-            card=card,
-            type=type,
-            year=for_year,
-            degree=degree,
-        )
-        session.merge(subject)
-        session.commit()
-
-    def update_subject_type(self, shortcut, type, for_year):
-        subject = Subject_details(shortcut=shortcut, type=type, year=for_year)
-        session.merge(subject)
-        session.commit()
-
-    def update_subject_degree(self, shortcut, degree):
-        subject = Subject_details(shortcut=shortcut, degree=degree)
-        session.merge(subject)
-        session.commit()
+    def sync_subjects(self, subjects):
+        """Bulk upsert of subjects (Subject_row) and their details in one transaction.
+        Details of subject are taken from its first row, semesters, types, years
+        and degrees of all rows are added to existing ones.
+        """
+        details = {}
+        links = {name: set() for name in subject_links}
+        for subject in subjects:
+            details.setdefault(subject.shortcut, {
+                "shortcut": subject.shortcut,
+                "name": subject.name,
+                "credits": subject.credits,
+                "end": subject.end,
+                "card": subject.card,
+            })
+            for name in subject_links:
+                links[name].add((subject.shortcut, getattr(subject, name)))
+        if not details:
+            return
 
-    def update_subject_sem(self, shortcut, sem):
-        subject = Subject_details(shortcut=shortcut, semester=sem)
-        session.merge(subject)
-        session.commit()
+        try:
+            session.execute(
+                insert(Subject.__table__)
+                .values([{"shortcut": shortcut.lower()} for shortcut in details])
+                .on_conflict_do_nothing()
+            )
+            statement = insert(Subject_details.__table__).values(list(details.values()))
+            changed = [
+                getattr(Subject_details, column).is_distinct_from(statement.excluded[column])
+                for column in ("name", "credits", "end", "card")
+            ]
+            session.execute(statement.on_conflict_do_update(
+                index_elements=[Subject_details.shortcut],
+                set_={column: statement.excluded[column] for column in ("name", "credits", "end", "card")},
+                where=or_(*changed),
+            ))
+            for name, link in subject_links.items():
+                values = [{"shortcut": shortcut, name: value} for shortcut, value in links[name] if value]
+                if values:
+                    session.execute(insert(link.__table__).values(values).on_conflict_do_nothing())
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        self.invalidate_tierboard()
@@ -0,0 +1,19 @@
+from repository.base_repository import BaseRepository
+from repository.database import session
+from repository.database.scheduler import Scheduled_job
+
+
+class SchedulerRepository(BaseRepository):
+
+    def add_job(self, kind: str, run_at, payload: dict):
+        job = Scheduled_job(kind=kind, run_at=run_at, payload=payload)
+        session.add(job)
+        session.commit()
+        return job
+
+    def get_jobs(self):
+        return session.query(Scheduled_job).order_by(Scheduled_job.run_at).all()
+
+    def delete_job(self, id: int):
+        session.query(Scheduled_job).filter(Scheduled_job.id == id).delete()
+        session.commit()
@@ -1,7 +1,26 @@
+from itertools import islice
+
+from sqlalchemy import text
+
 from repository.base_repository import BaseRepository
 from repository.database import session
 from repository.database.verification import Permit, Valid_person
 
+IMPORT_CHUNK = 1000
+# logins of people missing in import, numeric logins are from MUNI
+MISSING_YEAR = "CASE WHEN p.login ~ '^[0-9]+$' THEN 'MUNI' ELSE 'dropout' END"
+
+
+def parse_merlin(lines):
+    """Yields login, name and year of every person in merlin passwd lines"""
+    for line in lines:
+        line = line.split(":")
+        try:
+            gecos = line[4].split(",")
+            yield {'login': line[0], 'name': gecos[0], 'year': gecos[1]}
+        except IndexError:
+            continue
+
 
 class UserRepository(BaseRepository):
     # Status 0 = verified
@@ -45,3 +64,59 @@ class UserRepository(BaseRepository):
         """"Finds login from database"""
         session.add(Valid_person(login=login, year=year, status=status))
         session.commit()
+
+    def import_persons(self, lines, convert_0xit: bool = False):
+        """Synchronizes valid persons with merlin passwd `lines` in one transaction.
+        Lines are streamed to temporary table in chunks and applied by set-based updates.
+        People missing in the import are marked as MUNI or dropout.
+        If `convert_0xit`, new and already converted people of 1st year get 0r year.
+        Returns dict of counts of new, updated, missing and first_year people.
+        """
+        try:
+            session.execute(text(
+                "CREATE TEMPORARY TABLE merlin_import "
+                "(login VARCHAR PRIMARY KEY, name VARCHAR, year VARCHAR) ON COMMIT DROP"))
+
+            insert = text(
+                "INSERT INTO merlin_import (login, name, year) VALUES (:login, :name, :year) "
+                "ON CONFLICT (login) DO UPDATE SET name = excluded.name, year = excluded.year")
+            people = parse_merlin(lines)
+            while True:
+                chunk = list(islice(people, IMPORT_CHUNK))
+                if not chunk:
+                    break
+                session.execute(insert, chunk)
+
+            first_year = 0
+            if convert_0xit:
+                session.execute(text(
+                    "UPDATE merlin_import i SET year = replace(i.year, '1r', '0r') "
+                    "FROM bot_valid_persons p "
+                    "WHERE p.login = i.login AND i.year LIKE '%1r' AND p.year LIKE '%0r'"))
+                first_year = session.execute(text(
+                    "UPDATE merlin_import i SET year = replace(i.year, '1r', '0r') "
+                    "WHERE i.year LIKE '%1r' AND NOT EXISTS "
+                    "(SELECT 1 FROM bot_valid_persons p WHERE p.login = i.login)")).rowcount
+
+            # xmax is 0 only for rows inserted by this statement
+            upserted = session.execute(text(
+                "INSERT INTO bot_valid_persons (login, name, year, status) "
+                "SELECT login, name, year, 1 FROM merlin_import "
+                "ON CONFLICT (login) DO UPDATE SET name = excluded.name, year = excluded.year "
+                "WHERE (bot_valid_persons.name, bot_valid_persons.year) "
+                "IS DISTINCT FROM (excluded.name, excluded.year) "
+                "RETURNING xmax = 0")).fetchall()
+            new = sum(1 for inserted, in upserted if inserted)
+
+            missing = session.execute(text(
+                f"UPDATE bot_valid_persons p SET year = {MISSING_YEAR} "
+                "WHERE NOT EXISTS (SELECT 1 FROM merlin_import i WHERE i.login = p.login) "
+                f"AND p.year IS DISTINCT FROM {MISSING_YEAR}")).rowcount
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return {'new': new, 'updated': len(upserted) - new, 'missing': missing,
+                'first_year': first_year}
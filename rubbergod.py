@@ -8,6 +8,7 @@ import utils
 from config.messages import Messages
 from config.app_config import Config
 from features import presence
+from features.scheduler import scheduler
 
 import repository.db_migrations as migrations
 
@@ -52,6 +53,9 @@ async def on_ready():
         return
     is_initialized = True
 
+    # cogs registered their handlers while loading
+    scheduler.start()
+
     bot_room: TextChannel = bot.get_channel(config.bot_room)
     if bot_room is not None:
         await bot_room.send(Messages.on_ready_message)
@@ -77,6 +81,9 @@ migrations.init_db()
 bot.load_extension('cogs.system')
 print('System cog loaded')
 
+bot.load_extension('cogs.reactions')
+print('Reactions cog loaded')
+
 for extension in config.extensions:
     bot.load_extension(f'cogs.{extension}')
     print(f'{extension} loaded')
@@ -0,0 +1,49 @@
+import os
+
+from features.subject_parser import Subject_row, parse_subjects
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_page(name):
+    with open(os.path.join(FIXTURES, name), "rb") as page:
+        return page.read()
+
+
+def test_bit_program():
+    subjects = parse_subjects(load_page("fit_program_bit.html"), MIT=False)
+
+    # last table with PVT and PVA subjects is skipped
+    assert [subject.shortcut for subject in subjects] == [
+        "IDM", "IZP", "ITP", "IEL", "IOS", "IAL", "ISU", "IFJ", "RET", "IPK", "IBT"
+    ]
+    assert subjects[1] == Subject_row(
+        shortcut="IZP",
+        name="Základy programování",
+        credits=7,
+        semester="Z",
+        end="ZáZk",
+        card="https://www.fit.vut.cz/study/course/IZP/.cs",
+        type="P",
+        year="1BIT",
+        degree="BIT",
+    )
+    by_shortcut = {subject.shortcut: subject for subject in subjects}
+    assert (by_shortcut["IOS"].semester, by_shortcut["IOS"].year) == ("L", "1BIT")
+    assert (by_shortcut["IFJ"].semester, by_shortcut["IFJ"].year) == ("L", "2BIT")
+    assert (by_shortcut["IPK"].semester, by_shortcut["IPK"].year) == ("Z", "3BIT")
+    # optional subjects are for any year
+    assert (by_shortcut["RET"].type, by_shortcut["RET"].year) == ("V", "VBIT")
+
+
+def test_mit_field():
+    subjects = parse_subjects(load_page("fit_field_mit.html"), MIT=True)
+
+    assert [subject.shortcut for subject in subjects] == ["PDB", "RET", "SNT", "SEP", "DIP"]
+    assert all(subject.degree == "MIT" for subject in subjects)
+    by_shortcut = {subject.shortcut: subject for subject in subjects}
+    assert (by_shortcut["PDB"].semester, by_shortcut["PDB"].year) == ("Z", "1NADE")
+    assert (by_shortcut["SNT"].semester, by_shortcut["SNT"].year) == ("L", "1NADE")
+    assert (by_shortcut["DIP"].semester, by_shortcut["DIP"].year) == ("L", "2NADE")
+    assert by_shortcut["DIP"].credits == 17
+    assert (by_shortcut["RET"].type, by_shortcut["RET"].year) == ("V", "VMIT")
@@ -1,3 +1,5 @@
+import asyncio
+
 import git
 import discord
 from discord import Member
@@ -90,6 +92,28 @@ def cut_string(string: str, part_len: int):
     return list(string[0+i:part_len+i] for i in range(0, len(string), part_len))
 
 
+# message_id -> future of message fetch in progress
+message_fetches = {}
+
+
+async def fetch_message(bot, channel, message_id):
+    """Returns message from the bot's message cache, fetches it only if it's not there.
+    Concurrent calls for one message share a single request.
+    Fetched messages aren't kept, gateway events don't update them.
+    """
+    message = discord.utils.get(bot.cached_messages, id=message_id)
+    if message is not None:
+        return message
+
+    future = message_fetches.get(message_id)
+    if future is None:
+        future = asyncio.ensure_future(channel.fetch_message(message_id))
+        message_fetches[message_id] = future
+        future.add_done_callback(lambda done: message_fetches.pop(message_id, None))
+    # shield, so a cancelled caller doesn't cancel the fetch for the others
+    return await asyncio.shield(future)
+
+
 async def reaction_get_ctx(bot, payload):
     channel = bot.get_channel(payload.channel_id)
     if channel is None:
@@ -103,7 +127,7 @@ async def reaction_get_ctx(bot, payload):
     member = guild.get_member(payload.user_id)
 
     try:
-        message = await channel.fetch_message(payload.message_id)
+        message = await fetch_message(bot, channel, payload.message_id)
     except discord.errors.NotFound:
         return None
 